@@ -0,0 +1,75 @@
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import cv2
+
+from pipeline_logging import get_logger
+
+logger = get_logger(__name__)
+
+
+class ArtifactWriter:
+    """Persists intermediate pipeline images, optionally on background threads."""
+
+    def __init__(self, async_writes=True, max_workers=2, max_pending=32):
+        """
+        Args:
+            max_pending: Most writes queued at once in async mode; ``write``
+                blocks beyond that, so images waiting for a slow disk cannot
+                pile up in memory while the pipeline moves on.
+        """
+        self.async_writes = async_writes
+        self.max_pending = max_pending
+        self._executor = None
+        if async_writes:
+            self._executor = ThreadPoolExecutor(max_workers=max_workers,
+                                                thread_name_prefix='artifact-writer')
+        self._pending = []
+        self._lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(max_pending)
+
+    def write(self, path, image):
+        """Write an image to disk; returns once it is queued in async mode.
+
+        The image must not be modified by the caller until the writer is flushed.
+        """
+        if self._executor is None:
+            self._write(path, image)
+            return
+
+        self._slots.acquire()
+        try:
+            future = self._executor.submit(self._write, path, image)
+        except BaseException:
+            self._slots.release()
+            raise
+        future.add_done_callback(lambda _: self._slots.release())
+        with self._lock:
+            self._pending = [f for f in self._pending if not f.done()]
+            self._pending.append(future)
+
+    def flush(self):
+        """Block until every queued write has finished."""
+        with self._lock:
+            pending, self._pending = self._pending, []
+        for future in pending:
+            future.result()
+
+    def close(self):
+        """Flush pending writes and stop the background threads."""
+        self.flush()
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+
+    @staticmethod
+    def _write(path, image):
+        try:
+            directory = os.path.dirname(path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            if not cv2.imwrite(path, image):
+                logger.warning("⚠ Warning: Could not write %s", path)
+        except Exception as e:
+            logger.warning("⚠ Warning: Could not write %s: %s", path, e)
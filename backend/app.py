@@ -1,31 +1,43 @@
 import sys
 import os
-import shutil
-from typing import List
-from fastapi import FastAPI, Depends, UploadFile, File, HTTPException, BackgroundTasks
+from typing import List, Optional
+from fastapi import FastAPI, Depends, UploadFile, File, HTTPException, Query, Request
+from fastapi.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, PlainTextResponse, Response, StreamingResponse
 from fastapi.staticfiles import StaticFiles
-from sqlalchemy.orm import Session
+from sqlalchemy import func, select, tuple_
+from sqlalchemy.orm import Session, selectinload
 from datetime import datetime
 import asyncio
+import json
 
 # Append parent directory to path to import main.py
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from backend import models, schemas, database
-from main import IDCardProcessor
-
-# Constants
-UPLOAD_DIR = "input_images"
-OUTPUT_DIR = "output"
+from backend.config import (
+    EMBEDDED_WORKERS, OUTPUT_DIR, PIPELINE_CONFIG, SCAN_QUEUE_SIZE, THUMBNAIL_CACHE_BYTES,
+    THUMBNAIL_DIR, UPLOAD_DIR, UPLOAD_MAX_BYTES, UPLOAD_TEMP_DIR, local_path, served_path,
+)
+from backend.processing import (
+    create_dispatcher, job_queue, pipeline_metrics, progress_broker, result_cache, storage,
+    upload_handoff,
+)
+from backend.search import create_search_index, search_fields
+from backend.thumbnails import FORMATS, THUMBNAIL_WIDTHS, NotAnImageError, ThumbnailCache
+from backend.uploads import UploadTooLargeError, save_upload
+from main import PIPELINE_VERSION
 
 # Create directories
 os.makedirs(UPLOAD_DIR, exist_ok=True)
 os.makedirs(OUTPUT_DIR, exist_ok=True)
+os.makedirs(UPLOAD_TEMP_DIR, exist_ok=True)
 
 # Database
 models.Base.metadata.create_all(bind=database.engine)
+database.create_missing_indexes(models.Base.metadata)
+create_search_index(database.engine)
 
 app = FastAPI(title="Student Card Reader API")
 
@@ -43,6 +55,19 @@ app.mount("/output", StaticFiles(directory=OUTPUT_DIR), name="output")
 # We also might want to serve input images 
 app.mount("/input", StaticFiles(directory=UPLOAD_DIR), name="input")
 
+# Smaller renditions of the served images, see get_image
+thumbnail_cache = ThumbnailCache(THUMBNAIL_DIR, {"input": UPLOAD_DIR, "output": OUTPUT_DIR},
+                                 max_bytes=THUMBNAIL_CACHE_BYTES)
+# Variants of a source never change; revalidating with the ETag is cheap once this expires
+IMAGE_CACHE_CONTROL = "public, max-age=86400"
+if pipeline_metrics is not None:
+    pipeline_metrics.registry.counter(
+        'card_reader_thumbnail_hits_total', 'Image variants served from the disk cache.',
+        lambda: thumbnail_cache.hits)
+    pipeline_metrics.registry.counter(
+        'card_reader_thumbnail_misses_total', 'Image variants rendered on request.',
+        lambda: thumbnail_cache.misses)
+
 
 # Dependencies
 def get_db():
@@ -52,162 +77,256 @@ def get_db():
     finally:
         db.close()
 
-# Progress tracking (simple in-memory for now)
-# In a real app with multiple workers, this should be in Redis
-class ProgressTracker:
-    def __init__(self):
-        self.progress = {}  # scan_id -> {status, percent}
-
-    def update(self, scan_id, status, percent):
-        self.progress[scan_id] = {"status": status, "percent": percent}
+# Progress streams end once a scan reaches one of these
+TERMINAL_STATES = ("completed", "failed", "unknown")
+# Quiet period after which a progress stream re-reads the DB
+SSE_FALLBACK_INTERVAL = 2.0
 
-    def get(self, scan_id):
-        return self.progress.get(scan_id, {"status": "unknown", "percent": 0})
+# Jobs live in the database; this process also works them off unless disabled
+dispatcher = create_dispatcher() if EMBEDDED_WORKERS else None
 
-tracker = ProgressTracker()
-
-def process_scan_background(scan_id: int, file_path: str, db: Session):
-    scan = db.query(models.Scan).filter(models.Scan.id == scan_id).first()
-    if not scan:
-        return
-
-    def callback(status, percent):
-        tracker.update(scan_id, status, percent)
-        # Update DB status if significant change? 
-        # For now just keep in memory for realtime, DB for final state.
-    
+@app.on_event("startup")
+def start_dispatcher():
+    db = database.SessionLocal()
     try:
-        tracker.update(scan_id, "starting", 0)
-        scan.status = "processing"
-        db.commit()
-
-        processor = IDCardProcessor(debug_mode=False)
-        result = processor.process_image(file_path, OUTPUT_DIR, progress_callback=callback)
+        recovered = job_queue.recover_orphans(db, local_path)
+        if recovered:
+            print(f"✓ Re-queued {recovered} scans left unfinished by a previous run")
+        adopted = storage.adopt_untracked(db)
+        if adopted:
+            print(f"✓ Started tracking the files of {adopted} earlier scans")
+    finally:
+        db.close()
+    if dispatcher is not None:
+        dispatcher.start()
+    storage.start()
 
-        if result:
-            scan.status = "completed"
-            
-            # Save extracted fields to DB
-            # We need to map `result` structure to our DB models.
-            # result['extracted_texts'] is just a list of strings currently. 
-            # Ideally main.py should return structured field data.
-            # But based on main.py, `extracted_texts` comes from `text_extractor.extract_text`
-            # which returns a list of strings.
-            # `field_extractor.extract_fields` returns `field_info` (x, y, path).
-            # `text_extractor.extract_text` takes `field_info` but returns only text list.
-            # I should prefer modifying main.py to return combined info, but to minimize changes,
-            # I will re-implement the combination here or check if I can easily tweak main.py's return.
-            # main.py result: 
-            # {
-            #     'image_path': image_path,
-            #     'base_name': base_name,
-            #     'card_image': result['card_image'],
-            #     'extracted_texts': extracted_texts
-            # }
-            # Wait, `extracted_texts` are just strings. 
-            # If I want coordinates, I need to know which text belongs to which field.
-            
-            # CRITICAL: main.py implementation of `extract_text` returns a LIST of strings.
-            # It loses the coordinate information.
-            # I really should modify `TextExtractor.extract_text` to return a dictionary or objects with text AND coordinates.
-            # But let's check `TextExtractor.extract_text`.
-            # It calls `pytesseract` on each crop.
-            
-            # For now, I will assume the strings are in order and I can't easily get coords without refactoring.
-            # Wait, `field_extractor` returns `field_info` which has coords.
-            # `text_extractor` filters fields and sorts them.
-            # I should modify `TextExtractor` to return the full object.
-            
-            # TEMPORARY: Just save the texts without specific coords for now, 
-            # OR better, update main.py/text_extraction.py to return better data.
-            # Given the requirement "Visualize individual detected field sections ... Display field coordinates",
-            # I MUST refactor text_extraction.py to return structured data.
-            
-            # Let's assume for this step I will refactor text_extraction.py in the NEXT step.
-            # I'll just save what I have.
-            
-            # Save combined info
-            base_name = result['base_name']
-            for i, field_data in enumerate(result['extracted_texts']):
-                # Now we expect field_data to be a dict
-                if isinstance(field_data, dict):
-                    # We need to make the path relative to output/ or use the full web path
-                    # field_data['path'] is absolute local path. 
-                    # We want relative to where static files are served?
-                    # or just the filename if it's in output/
-                    field_filename = os.path.basename(field_data['path'])
-                    # It is in output/{base_name}_fields/{filename}
-                    # We need the relative path from project root or output dir.
-                    # 'path' is e.g. /Users/.../output/basename_fields/x_y.jpg
-                    
-                    # Construct relative path for DB
-                    relative_path = f"output/{base_name}_fields/{field_filename}"
-                    
-                    db_field = models.ScanField(
-                        scan_id=scan.id,
-                        text=field_data['text'],
-                        x=field_data.get('x', 0),
-                        y=field_data.get('y', 0),
-                        width=field_data.get('width', 0),
-                        height=field_data.get('height', 0),
-                        image_path=relative_path,
-                        confidence=0.9 # Mock confidence
-                    )
-                    db.add(db_field)
-                else:
-                    # Fallback for string
-                   pass
-            # Update scan paths
-            # The processor saves `output/{base_name}_detected_card.jpg`
-            base_name = result['base_name']
-            scan.card_image_path = f"output/{base_name}_detected_card.jpg"
-            
-        else:
-            scan.status = "failed"
-            scan.error_message = "Card detection failed"
-        
-        db.commit()
-    
-    except Exception as e:
-        scan.status = "failed"
-        scan.error_message = str(e)
-        db.commit()
-        print(f"Error processing scan {scan_id}: {e}")
+@app.on_event("shutdown")
+def stop_dispatcher():
+    storage.stop()
+    if dispatcher is not None:
+        dispatcher.stop()
 
 @app.post("/api/scan", response_model=schemas.Scan)
 async def upload_scan(
-    background_tasks: BackgroundTasks,
+    request: Request,
     file: UploadFile = File(...),
     db: Session = Depends(get_db)
 ):
-    # Save uploaded file
-    file_path = os.path.join(UPLOAD_DIR, file.filename)
-    with open(file_path, "wb") as buffer:
-        shutil.copyfileobj(file.file, buffer)
+    # Reject obviously oversized bodies before reading them
+    content_length = request.headers.get("content-length")
+    if content_length and content_length.isdigit() and int(content_length) > UPLOAD_MAX_BYTES + 64 * 1024:
+        raise HTTPException(status_code=413, detail=f"Upload exceeds {UPLOAD_MAX_BYTES} bytes")
+    
+    try:
+        upload = await save_upload(file, UPLOAD_DIR, UPLOAD_TEMP_DIR, UPLOAD_MAX_BYTES,
+                                   keep_data=dispatcher is not None and upload_handoff.enabled)
+    except UploadTooLargeError as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    
+    # Database work is blocking, keep it off the event loop
+    return await run_in_threadpool(register_upload, db, upload, file.filename)
+
+def register_upload(db: Session, upload, filename: str):
+    """Answer an upload from the cache, or create its scan and queue it."""
+    cache_key = result_cache.key_from_digest(upload.digest, PIPELINE_VERSION, PIPELINE_CONFIG)
+    
+    original_path = served_path(upload.path)
+    cached = result_cache.lookup(db, cache_key)
+    if cached is not None:
+        # Clones point at the cached scan's photo; the new copy is collected unless
+        # shared (not deleted now, a concurrent upload of it may be about to track it)
+        storage.track_unused(db, [original_path])
+        return clone_cached_scan(db, cached, filename)
+    
+    # Refuse work instead of letting the queue grow without bound
+    if job_queue.depth(db) >= SCAN_QUEUE_SIZE:
+        # Likewise left to the collector, which needs its artifact row to find it
+        storage.track_unused(db, [original_path])
+        db.commit()
+        raise HTTPException(status_code=429, detail="Processing queue is full, try again later")
     
     # Create DB record
     db_scan = models.Scan(
-        filename=file.filename,
-        original_image_path=f"input/{file.filename}",
+        filename=filename,
+        original_image_path=original_path,
         status="pending"
     )
     db.add(db_scan)
+    storage.track(db, db_scan, [original_path])
     db.commit()
     db.refresh(db_scan)
     
-    # Trigger background processing
-    background_tasks.add_task(process_scan_background, db_scan.id, file_path, db)
+    # Queue for processing by any dispatcher on this node
+    if upload.data is not None:
+        upload_handoff.put(db_scan.id, upload.data)
+    job_queue.enqueue(db, db_scan.id, upload.path, cache_key)
+    if dispatcher is not None:
+        dispatcher.wake()
     
     return db_scan
 
-@app.get("/api/scans", response_model=List[schemas.Scan])
-def get_scans(skip: int = 0, limit: int = 100, db: Session = Depends(get_db)):
-    scans = db.query(models.Scan).order_by(models.Scan.created_at.desc()).offset(skip).limit(limit).all()
-    return scans
+def clone_cached_scan(db: Session, source: models.Scan, filename: str):
+    """Create a completed scan that shares the artifacts and fields of a cached one."""
+    db_scan = models.Scan(
+        filename=filename,
+        original_image_path=source.original_image_path,
+        card_image_path=source.card_image_path,
+        status="completed",
+    )
+    db_scan.fields = [
+        models.ScanField(
+            text=field.text,
+            confidence=field.confidence,
+            x=field.x,
+            y=field.y,
+            width=field.width,
+            height=field.height,
+            image_path=field.image_path,
+        )
+        for field in source.fields
+    ]
+    # Shared files stay on disk until the last scan using them is deleted
+    db_scan.artifacts = list(source.artifacts)
+    db.add(db_scan)
+    db.commit()
+    db.refresh(db_scan)
+    return db_scan
+
+@app.get("/metrics", response_class=PlainTextResponse)
+def get_metrics():
+    """Pipeline, queue and cache metrics in the Prometheus text format."""
+    if pipeline_metrics is None:
+        raise HTTPException(status_code=404, detail="Metrics are disabled")
+    return PlainTextResponse(pipeline_metrics.registry.render(),
+                             media_type="text/plain; version=0.0.4")
+
+@app.get("/api/cache/stats")
+def get_cache_stats(db: Session = Depends(get_db)):
+    return result_cache.stats(db)
+
+@app.get("/api/storage/stats")
+def get_storage_stats(db: Session = Depends(get_db)):
+    return storage.stats(db)
+
+@app.get("/api/images/stats")
+def get_image_stats():
+    return thumbnail_cache.stats()
+
+@app.get("/api/images/{path:path}")
+def get_image(path: str, request: Request, w: Optional[int] = None, format: Optional[str] = None):
+    """An image under /input or /output, resized to ``w`` pixels wide and re-encoded.
+
+    Without ``w`` the image keeps its size (e.g. cards with field boxes
+    drawn over them). The format defaults to WebP for clients that accept
+    it. Variants are rendered once and then served from the disk cache.
+    """
+    if w is not None and w not in THUMBNAIL_WIDTHS:
+        raise HTTPException(status_code=400, detail=f"w must be one of {list(THUMBNAIL_WIDTHS)}")
+    if format is not None and format not in FORMATS:
+        raise HTTPException(status_code=400, detail=f"format must be one of {list(FORMATS)}")
+    if format is None:
+        format = "webp" if "image/webp" in request.headers.get("accept", "") else "jpeg"
+    try:
+        source = thumbnail_cache.source_path(path)
+        etag = thumbnail_cache.etag(source, w, format)
+    except FileNotFoundError:
+        raise HTTPException(status_code=404, detail="Image not found")
+    
+    headers = {"ETag": f'"{etag}"', "Cache-Control": IMAGE_CACHE_CONTROL, "Vary": "Accept"}
+    if f'"{etag}"' in request.headers.get("if-none-match", ""):
+        return Response(status_code=304, headers=headers)
+    try:
+        data = thumbnail_cache.get(source, etag, w, format)
+    except NotAnImageError:
+        raise HTTPException(status_code=415, detail="Not an image")
+    return Response(content=data, media_type=FORMATS[format][1], headers=headers)
+
+def encode_cursor(scan):
+    return f"{scan.created_at.isoformat()},{scan.id}"
+
+def decode_cursor(cursor: str):
+    try:
+        created_at, scan_id = cursor.rsplit(",", 1)
+        return datetime.fromisoformat(created_at), int(scan_id)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+def summary_query(db: Session):
+    """Rows with the columns of ``schemas.ScanSummary``, fields counted in SQL."""
+    field_count = (
+        select(func.count(models.ScanField.id))
+        .where(models.ScanField.scan_id == models.Scan.id)
+        .scalar_subquery()
+    )
+    return db.query(
+        models.Scan.id,
+        models.Scan.filename,
+        models.Scan.status,
+        models.Scan.created_at,
+        models.Scan.card_image_path,
+        field_count.label("field_count"),
+    )
+
+@app.get("/api/scans", response_model=schemas.ScanPage)
+def get_scans(cursor: Optional[str] = None, limit: int = Query(50, ge=1, le=100),
+              db: Session = Depends(get_db)):
+    """Newest scans first, one page at a time.
+
+    Pages continue after the (created_at, id) of the previous page's last
+    scan, so each page is an index range scan however deep it is.
+    """
+    query = summary_query(db)
+    if cursor:
+        query = query.filter(tuple_(models.Scan.created_at, models.Scan.id) < decode_cursor(cursor))
+    # One extra row tells whether another page follows
+    rows = query.order_by(models.Scan.created_at.desc(), models.Scan.id.desc()).limit(limit + 1).all()
+    
+    items = [schemas.ScanSummary(**row._mapping) for row in rows[:limit]]
+    next_cursor = encode_cursor(rows[limit - 1]) if len(rows) > limit else None
+    return schemas.ScanPage(items=items, next_cursor=next_cursor)
+
+@app.get("/api/search", response_model=List[schemas.SearchResult])
+def search_scans(q: str = Query(..., min_length=1, max_length=200),
+                 limit: int = Query(20, ge=1, le=100), before: Optional[int] = None,
+                 db: Session = Depends(get_db)):
+    """Scans with fields matching every word of ``q`` as a prefix, newest first.
+
+    Matching ignores case and Turkish diacritics, so "ozturk" finds "ÖZTÜRK".
+    Pass the last scan id of a page as ``before`` to get the next one.
+    """
+    matches = search_fields(db, q, max_scans=limit, before=before)
+    if not matches:
+        return []
+    
+    scan_ids = [scan_id for scan_id, _ in matches]
+    summaries = {row.id: row for row in summary_query(db).filter(models.Scan.id.in_(scan_ids))}
+    results = []
+    for scan_id, fields in matches:
+        row = summaries.get(scan_id)
+        if row is None:
+            continue
+        results.append(schemas.SearchResult(
+            scan=schemas.ScanSummary(**row._mapping),
+            fields=[
+                schemas.FieldMatch(
+                    id=field_id,
+                    text=text,
+                    spans=[schemas.TextSpan(text=piece, match=matched) for piece, matched in spans],
+                )
+                for field_id, text, spans in fields
+            ],
+        ))
+    return results
 
 @app.get("/api/scans/{scan_id}", response_model=schemas.Scan)
 def get_scan(scan_id: int, db: Session = Depends(get_db)):
-    scan = db.query(models.Scan).filter(models.Scan.id == scan_id).first()
+    scan = (
+        db.query(models.Scan)
+        .options(selectinload(models.Scan.fields))
+        .filter(models.Scan.id == scan_id)
+        .first()
+    )
     if not scan:
         raise HTTPException(status_code=404, detail="Scan not found")
     return scan
@@ -218,13 +337,67 @@ def delete_scan(scan_id: int, db: Session = Depends(get_db)):
     if not scan:
         raise HTTPException(status_code=404, detail="Scan not found")
     
-    # Delete files?
-    # TODO: Implement file deletion cleanup
-    
-    db.delete(scan)
-    db.commit()
+    # Files shared with other scans (same photo, cache clones) are kept
+    storage.delete_scan(db, scan)
     return {"ok": True}
 
+def read_scan_progress(db: Session, scan_id: int):
+    job = job_queue.progress(db, scan_id)
+    if job is None or job.status in ("completed", "failed"):
+        # Finished (or never queued, e.g. a cache hit): the scan has the outcome
+        scan = db.query(models.Scan).filter(models.Scan.id == scan_id).first()
+        if scan is None:
+            return {"status": "unknown", "percent": 0}
+        done = scan.status in ("completed", "failed")
+        return {"status": scan.status, "percent": 100 if done else 0}
+    
+    return {
+        "status": job.stage,
+        "percent": job.percent,
+        "attempts": job.attempts,
+        "error": job.last_error,
+    }
+
 @app.get("/api/scan/{scan_id}/progress")
-def get_scan_progress(scan_id: int):
-    return tracker.get(scan_id)
+def get_scan_progress(scan_id: int, db: Session = Depends(get_db)):
+    return read_scan_progress(db, scan_id)
+
+def _read_scan_progress_once(scan_id: int):
+    db = database.SessionLocal()
+    try:
+        return read_scan_progress(db, scan_id)
+    finally:
+        db.close()
+
+@app.get("/api/scans/{scan_id}/events")
+async def stream_scan_events(scan_id: int, request: Request):
+    """Server-sent events with the scan's progress until it completes or fails.
+    
+    Stages published by this process's workers arrive immediately. Scans
+    handled by another process are picked up from the DB whenever the stream
+    has been quiet for SSE_FALLBACK_INTERVAL seconds.
+    """
+    async def event_stream():
+        # Subscribe before reading the current state so no transition is missed
+        with progress_broker.subscribe(scan_id) as events:
+            state = await run_in_threadpool(_read_scan_progress_once, scan_id)
+            yield f"data: {json.dumps(state)}\n\n"
+            
+            while state["status"] not in TERMINAL_STATES:
+                if await request.is_disconnected():
+                    return
+                try:
+                    update = await asyncio.wait_for(events.get(), timeout=SSE_FALLBACK_INTERVAL)
+                except asyncio.TimeoutError:
+                    update = await run_in_threadpool(_read_scan_progress_once, scan_id)
+                    if update == state:
+                        yield ": keep-alive\n\n"
+                        continue
+                state = update
+                yield f"data: {json.dumps(state)}\n\n"
+    
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
@@ -0,0 +1,138 @@
+import hashlib
+import json
+import os
+import threading
+from datetime import datetime
+
+from sqlalchemy import func
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from backend import models
+
+
+class ResultCache:
+    """Content-addressed cache of completed scans, persisted in the database.
+
+    Keys are the SHA-256 of the uploaded bytes plus the pipeline version and
+    configuration, so a re-upload of the same photo maps to the scan that
+    already processed it. Entries are evicted least-recently-used first once
+    ``max_entries`` or ``max_bytes`` (artifact bytes on disk) is exceeded.
+    """
+
+    def __init__(self, max_entries=10000, max_bytes=5 * 1024 ** 3, resolve_path=None):
+        """
+        Args:
+            resolve_path: Maps a stored (served) image path to a local file path.
+        """
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.resolve_path = resolve_path or (lambda path: path)
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def make_key(data: bytes, version: str, config: dict) -> str:
+        return ResultCache.key_from_digest(hashlib.sha256(data), version, config)
+
+    @staticmethod
+    def key_from_digest(digest, version: str, config: dict) -> str:
+        """Key for content already hashed incrementally into a sha256 ``digest``."""
+        digest = digest.copy()
+        digest.update(version.encode())
+        digest.update(json.dumps(config, sort_keys=True).encode())
+        return digest.hexdigest()
+
+    def _artifact_paths(self, scan):
+        paths = [scan.original_image_path, scan.card_image_path]
+        paths += [field.image_path for field in scan.fields]
+        return [self.resolve_path(p) for p in paths if p]
+
+    def _count(self, hit):
+        with self._lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+    def lookup(self, db: Session, key: str):
+        """Return the completed scan cached under ``key``, or None on a miss."""
+        entry = db.query(models.CacheEntry).filter(models.CacheEntry.key == key).first()
+        if entry is None:
+            self._count(hit=False)
+            return None
+
+        scan = entry.scan
+        # Drop entries whose scan or artifacts disappeared underneath us
+        if scan is None or scan.status != "completed" or not all(
+                os.path.exists(p) for p in self._artifact_paths(scan)):
+            db.delete(entry)
+            db.commit()
+            self._count(hit=False)
+            return None
+
+        entry.hits += 1
+        entry.last_used_at = datetime.utcnow()
+        db.commit()
+        self._count(hit=True)
+        return scan
+
+    def store(self, db: Session, key: str, scan):
+        """Remember a completed scan under ``key`` and enforce the size bounds."""
+        size = sum(os.path.getsize(p) for p in self._artifact_paths(scan) if os.path.exists(p))
+        for _ in range(2):
+            entry = db.query(models.CacheEntry).filter(models.CacheEntry.key == key).first()
+            if entry is None:
+                entry = models.CacheEntry(key=key)
+                db.add(entry)
+            entry.scan_id = scan.id
+            entry.size_bytes = size
+            entry.last_used_at = datetime.utcnow()
+            try:
+                db.commit()
+                break
+            except IntegrityError:
+                # Identical photos uploaded together finish at the same time;
+                # the other one created the entry, so update it instead
+                db.rollback()
+        self.evict(db)
+
+    def forget_scan(self, db: Session, scan_id: int):
+        """Remove entries pointing at a scan that is being deleted."""
+        db.query(models.CacheEntry).filter(models.CacheEntry.scan_id == scan_id).delete()
+
+    def evict(self, db: Session):
+        """Drop least-recently-used entries until both bounds are respected."""
+        count, total = db.query(func.count(models.CacheEntry.key),
+                                func.coalesce(func.sum(models.CacheEntry.size_bytes), 0)).one()
+        if count <= self.max_entries and total <= self.max_bytes:
+            return
+
+        entries = db.query(models.CacheEntry).order_by(models.CacheEntry.last_used_at.asc())
+        for entry in entries:
+            if count <= self.max_entries and total <= self.max_bytes:
+                break
+            count -= 1
+            total -= entry.size_bytes or 0
+            db.delete(entry)
+            with self._lock:
+                self.evictions += 1
+        db.commit()
+
+    def stats(self, db: Session):
+        count, total = db.query(func.count(models.CacheEntry.key),
+                                func.coalesce(func.sum(models.CacheEntry.size_bytes), 0)).one()
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "evictions": self.evictions,
+                "entries": count,
+                "size_bytes": total,
+                "max_entries": self.max_entries,
+                "max_bytes": self.max_bytes,
+            }
@@ -0,0 +1,67 @@
+import os
+
+# Directories for uploads and pipeline artifacts, served under /input and /output
+UPLOAD_DIR = "input_images"
+OUTPUT_DIR = "output"
+
+# Options the processor is built with; part of the result cache key
+PIPELINE_CONFIG = {"debug_mode": False}
+
+# Uploads larger than this are rejected with HTTP 413 while streaming
+UPLOAD_MAX_BYTES = int(os.getenv("UPLOAD_MAX_BYTES", 20 * 1024 ** 2))
+# Memory for handing uploaded bytes straight to this process's workers; 0 disables
+UPLOAD_HANDOFF_BYTES = int(os.getenv("UPLOAD_HANDOFF_BYTES", 0))
+# Uploads being received, outside the served directories; must share a filesystem with UPLOAD_DIR
+UPLOAD_TEMP_DIR = os.getenv("UPLOAD_TEMP_DIR", "data/uploads-tmp")
+
+# Processing
+SCAN_WORKERS = int(os.getenv("SCAN_WORKERS", 2))  # processes per dispatcher
+SCAN_QUEUE_SIZE = int(os.getenv("SCAN_QUEUE_SIZE", 100))  # queued jobs before uploads get 429
+SCAN_TIMEOUT = float(os.getenv("SCAN_TIMEOUT", 120))  # seconds per attempt
+SCAN_MAX_ATTEMPTS = int(os.getenv("SCAN_MAX_ATTEMPTS", 3))
+SCAN_RETRY_BACKOFF = float(os.getenv("SCAN_RETRY_BACKOFF", 5))  # seconds, doubled per attempt
+# Run a dispatcher inside each API process; disable when using `python -m backend.processing`
+EMBEDDED_WORKERS = os.getenv("EMBEDDED_WORKERS", "1") == "1"
+
+# SQLite: seconds a writer waits for the database lock before "database is locked"
+SQLITE_BUSY_TIMEOUT = float(os.getenv("SQLITE_BUSY_TIMEOUT", 30))
+# Write-ahead logging lets readers run next to a writer; disable on network filesystems
+SQLITE_WAL = os.getenv("SQLITE_WAL", "1") == "1"
+
+# Log output of the pipeline in worker processes: text, json or silent
+PIPELINE_LOG = os.getenv("PIPELINE_LOG", "text")
+
+# Pipeline and queue metrics on /metrics; disabling skips all recording
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "1") == "1"
+
+# Artifact retention; finished scans are deleted with their files. 0 disables a limit.
+STORAGE_RETENTION_DAYS = float(os.getenv("STORAGE_RETENTION_DAYS", 0))
+STORAGE_MAX_BYTES = int(os.getenv("STORAGE_MAX_BYTES", 0))  # oldest scans go first
+STORAGE_GC_INTERVAL = float(os.getenv("STORAGE_GC_INTERVAL", 3600))  # seconds
+
+# Resized/WebP image variants for the frontend, evicted least-recently-used beyond the size
+THUMBNAIL_DIR = os.getenv("THUMBNAIL_DIR", "data/thumbnails")
+THUMBNAIL_CACHE_BYTES = int(os.getenv("THUMBNAIL_CACHE_BYTES", 256 * 1024 ** 2))
+
+# Result cache
+CACHE_MAX_ENTRIES = int(os.getenv("CACHE_MAX_ENTRIES", 10000))
+CACHE_MAX_BYTES = int(os.getenv("CACHE_MAX_BYTES", 5 * 1024 ** 3))
+
+
+def local_path(served_path: str) -> str:
+    """Map a path stored in the DB (as served by the static mounts) to disk."""
+    prefix, _, rest = served_path.partition("/")
+    if prefix == "input":
+        return os.path.join(UPLOAD_DIR, rest)
+    if prefix == "output":
+        return os.path.join(OUTPUT_DIR, rest)
+    return served_path
+
+
+def served_path(path: str) -> str:
+    """Inverse of ``local_path``: the path a file on disk is served (and stored) under."""
+    for prefix, directory in (("input", UPLOAD_DIR), ("output", OUTPUT_DIR)):
+        relative = os.path.relpath(path, directory)
+        if not relative.startswith(os.pardir):
+            return f"{prefix}/{relative.replace(os.sep, '/')}"
+    return path
@@ -1,16 +1,44 @@
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 import os
 
+from backend.config import SQLITE_BUSY_TIMEOUT, SQLITE_WAL
+
 # Create database directory if it doesn't exist
 os.makedirs("data", exist_ok=True)
 
 SQLALCHEMY_DATABASE_URL = "sqlite:///./data/scans.db"
 
-engine = create_engine(
-    SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False}
-)
+
+def create_sqlite_engine(url, wal=True, busy_timeout=30.0):
+    """Engine set up for several processes writing scan results to one SQLite file.
+
+    Args:
+        wal: Use write-ahead logging, so reads never wait for a writer and
+            commits only append to the log.
+        busy_timeout: Seconds a connection waits for the write lock before
+            failing with "database is locked".
+    """
+    engine = create_engine(
+        url, connect_args={"check_same_thread": False, "timeout": busy_timeout}
+    )
+
+    @event.listens_for(engine, "connect")
+    def set_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        if wal:
+            cursor.execute("PRAGMA journal_mode=WAL")
+            # In WAL mode a crash can lose the last commits but never corrupts the file
+            cursor.execute("PRAGMA synchronous=NORMAL")
+        cursor.execute("PRAGMA cache_size=-16000")  # KiB per connection
+        cursor.execute("PRAGMA temp_store=MEMORY")
+        cursor.close()
+
+    return engine
+
+
+engine = create_sqlite_engine(SQLALCHEMY_DATABASE_URL, wal=SQLITE_WAL, busy_timeout=SQLITE_BUSY_TIMEOUT)
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
 Base = declarative_base()
@@ -21,3 +49,9 @@ def get_db():
         yield db
     finally:
         db.close()
+
+def create_missing_indexes(metadata):
+    """Add indexes declared after a table was created; create_all() skips existing tables."""
+    for table in metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(bind=engine, checkfirst=True)
@@ -0,0 +1,39 @@
+import asyncio
+import threading
+from contextlib import contextmanager
+
+
+class ProgressBroker:
+    """Fans scan progress events out to server-sent-event subscribers.
+
+    ``publish`` may be called from any thread (e.g. the executor's progress
+    listener); events are handed to each subscriber's event loop safely.
+    """
+
+    def __init__(self):
+        self._subscribers = {}  # scan_id -> set of (loop, asyncio.Queue)
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def subscribe(self, scan_id: int):
+        """Register an asyncio queue receiving events for ``scan_id``."""
+        subscriber = (asyncio.get_running_loop(), asyncio.Queue())
+        with self._lock:
+            self._subscribers.setdefault(scan_id, set()).add(subscriber)
+        try:
+            yield subscriber[1]
+        finally:
+            with self._lock:
+                subscribers = self._subscribers.get(scan_id, set())
+                subscribers.discard(subscriber)
+                if not subscribers:
+                    self._subscribers.pop(scan_id, None)
+
+    def publish(self, scan_id: int, event: dict):
+        with self._lock:
+            subscribers = list(self._subscribers.get(scan_id, ()))
+        for loop, queue in subscribers:
+            try:
+                loop.call_soon_threadsafe(queue.put_nowait, event)
+            except RuntimeError:
+                pass  # subscriber's loop already closed
@@ -0,0 +1,165 @@
+import os
+import socket
+import threading
+import uuid
+from datetime import datetime, timedelta
+
+from sqlalchemy import and_, func, or_, select, update
+from sqlalchemy.orm import Session
+
+from backend import models
+
+
+def worker_identity():
+    """Name recorded on claimed jobs: host, process and thread."""
+    return f"{socket.gethostname()}:{os.getpid()}:{threading.get_ident()}"
+
+
+class JobQueue:
+    """Durable scan job queue stored in the ``jobs`` table.
+
+    Any number of API or worker processes on the node can share it: jobs are
+    claimed with a single conditional UPDATE, so each job is handed to exactly
+    one worker. A claim is a lease; a worker that dies stops renewing it and
+    the job is picked up again once the lease expires. Failed attempts are
+    retried with exponential backoff up to ``max_attempts``.
+    """
+
+    def __init__(self, session_factory, lease_seconds=300, max_attempts=3, retry_backoff=5.0):
+        self.session_factory = session_factory
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        self.retry_backoff = retry_backoff
+
+    def enqueue(self, db: Session, scan_id: int, file_path: str, cache_key: str = None):
+        job = models.Job(
+            scan_id=scan_id,
+            file_path=file_path,
+            cache_key=cache_key,
+            max_attempts=self.max_attempts,
+            next_run_at=datetime.utcnow(),
+        )
+        db.add(job)
+        db.commit()
+        return job
+
+    def depth(self, db: Session):
+        """Number of jobs waiting to be claimed."""
+        return db.query(func.count(models.Job.id)).filter(models.Job.status == "queued").scalar()
+
+    @staticmethod
+    def _claimable(now):
+        Job = models.Job
+        return or_(
+            and_(Job.status == "queued", Job.next_run_at <= now),
+            and_(Job.status == "running", Job.lease_expires_at < now),  # abandoned
+        )
+
+    def claim(self, worker_id: str):
+        """Atomically claim the next runnable job; returns a detached Job or None."""
+        Job = models.Job
+        now = datetime.utcnow()
+        token = uuid.uuid4().hex
+        next_id = (select(Job.id).where(self._claimable(now))
+                   .order_by(Job.next_run_at, Job.id).limit(1).scalar_subquery())
+        stmt = (
+            update(Job)
+            .where(Job.id == next_id)
+            .where(self._claimable(now))
+            .values(
+                status="running",
+                stage="claimed",
+                claimed_by=worker_id,
+                claim_token=token,
+                attempts=Job.attempts + 1,
+                lease_expires_at=now + timedelta(seconds=self.lease_seconds),
+                updated_at=now,
+            )
+            .execution_options(synchronize_session=False)
+        )
+
+        db = self.session_factory()
+        try:
+            if db.execute(stmt).rowcount != 1:
+                db.rollback()
+                return None
+            db.commit()
+            job = db.query(Job).filter(Job.claim_token == token).first()
+            db.expunge(job)
+            return job
+        finally:
+            db.close()
+
+    def _update_claimed(self, job, db: Session = None, **values):
+        """Update a job only while we still hold its claim; returns success.
+
+        With ``db`` the update joins that session's transaction and the caller
+        commits it; otherwise it is committed in a session of its own.
+        """
+        Job = models.Job
+        values["updated_at"] = datetime.utcnow()
+        own_session = db is None
+        if own_session:
+            db = self.session_factory()
+        try:
+            result = db.execute(
+                update(Job)
+                .where(Job.id == job.id, Job.claim_token == job.claim_token)
+                .values(**values)
+                .execution_options(synchronize_session=False)
+            )
+            if own_session:
+                db.commit()
+            return result.rowcount == 1
+        finally:
+            if own_session:
+                db.close()
+
+    def report_progress(self, job, stage: str, percent: int):
+        """Record the current stage and renew the lease."""
+        lease = datetime.utcnow() + timedelta(seconds=self.lease_seconds)
+        return self._update_claimed(job, stage=stage, percent=percent, lease_expires_at=lease)
+
+    def complete(self, job, db: Session = None):
+        return self._update_claimed(job, db, status="completed", stage="completed", percent=100,
+                                    lease_expires_at=None, claim_token=None)
+
+    def holds_claim(self, db: Session, job) -> bool:
+        """Whether ``job`` is still claimed by us (not finished, nor reclaimed elsewhere)."""
+        Job = models.Job
+        return db.query(Job.id).filter(Job.id == job.id,
+                                       Job.claim_token == job.claim_token).first() is not None
+
+    def fail(self, job, error: str):
+        """Record a failed attempt; returns True if the job will be retried.
+
+        Returns False without changing anything if we no longer hold the claim.
+        """
+        if job.attempts < job.max_attempts:
+            delay = self.retry_backoff * (2 ** (job.attempts - 1))
+            return self._update_claimed(job, status="queued", stage="retrying", percent=0,
+                                        last_error=error, claim_token=None, lease_expires_at=None,
+                                        next_run_at=datetime.utcnow() + timedelta(seconds=delay))
+        self._update_claimed(job, status="failed", stage="failed", percent=100,
+                             last_error=error, claim_token=None, lease_expires_at=None)
+        return False
+
+    def progress(self, db: Session, scan_id: int):
+        """Latest job state for a scan, or None if it never had a job."""
+        return (db.query(models.Job).filter(models.Job.scan_id == scan_id)
+                .order_by(models.Job.id.desc()).first())
+
+    def recover_orphans(self, db: Session, resolve_path):
+        """Enqueue scans left pending/processing without any job (pre-queue rows)."""
+        has_job = select(models.Job.id).where(models.Job.scan_id == models.Scan.id).exists()
+        orphans = (db.query(models.Scan)
+                   .filter(models.Scan.status.in_(["pending", "processing"]), ~has_job).all())
+        for scan in orphans:
+            file_path = resolve_path(scan.original_image_path)
+            if os.path.exists(file_path):
+                self.enqueue(db, scan.id, file_path)
+            else:
+                scan.status = "failed"
+                scan.error_message = "Upload missing after restart"
+                db.commit()
+        return len(orphans)
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, DateTime, Float, ForeignKey, Text
+from sqlalchemy import Column, Integer, String, DateTime, Float, ForeignKey, Text, Index
 from sqlalchemy.orm import relationship
 from datetime import datetime
 from .database import Base
@@ -15,12 +15,18 @@ class Scan(Base):
     error_message = Column(Text, nullable=True)
 
     fields = relationship("ScanField", back_populates="scan", cascade="all, delete-orphan")
+    # Files on disk this scan uses; shared with scans of the same photo
+    artifacts = relationship("Artifact", secondary="scan_artifacts")
+
+    # Serves the newest-first history listing and its keyset cursor
+    __table_args__ = (Index("ix_scans_created_at_id", "created_at", "id"),)
 
 class ScanField(Base):
     __tablename__ = "scan_fields"
 
     id = Column(Integer, primary_key=True, index=True)
-    scan_id = Column(Integer, ForeignKey("scans.id"))
+    # Serves the per-scan field count of the history listing
+    scan_id = Column(Integer, ForeignKey("scans.id"), index=True)
     text = Column(String)
     confidence = Column(Float, default=0.0)
     x = Column(Integer)
@@ -30,3 +36,51 @@ class ScanField(Base):
     image_path = Column(String)
 
     scan = relationship("Scan", back_populates="fields")
+
+class CacheEntry(Base):
+    __tablename__ = "cache_entries"
+
+    key = Column(String, primary_key=True)  # sha256 of upload bytes + pipeline config
+    scan_id = Column(Integer, ForeignKey("scans.id"), index=True)
+    size_bytes = Column(Integer, default=0)
+    hits = Column(Integer, default=0)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    last_used_at = Column(DateTime, default=datetime.utcnow, index=True)
+
+    scan = relationship("Scan")
+
+class Job(Base):
+    __tablename__ = "jobs"
+
+    id = Column(Integer, primary_key=True, index=True)
+    scan_id = Column(Integer, ForeignKey("scans.id"), index=True)
+    file_path = Column(String)
+    cache_key = Column(String, nullable=True)
+    status = Column(String, default="queued")  # queued, running, completed, failed
+    stage = Column(String, default="queued")  # last pipeline stage reported
+    percent = Column(Integer, default=0)
+    attempts = Column(Integer, default=0)
+    max_attempts = Column(Integer, default=3)
+    next_run_at = Column(DateTime, default=datetime.utcnow)
+    claimed_by = Column(String, nullable=True)
+    claim_token = Column(String, nullable=True, index=True)
+    lease_expires_at = Column(DateTime, nullable=True)
+    last_error = Column(Text, nullable=True)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    updated_at = Column(DateTime, default=datetime.utcnow)
+
+    __table_args__ = (Index("ix_jobs_status_next_run_at", "status", "next_run_at"),)
+
+class Artifact(Base):
+    __tablename__ = "artifacts"
+
+    id = Column(Integer, primary_key=True, index=True)
+    path = Column(String, unique=True, index=True)  # as served, e.g. output/3f/a2/<name>_fields
+    size_bytes = Column(Integer, default=0)
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+class ScanArtifact(Base):
+    __tablename__ = "scan_artifacts"
+
+    scan_id = Column(Integer, ForeignKey("scans.id"), primary_key=True)
+    artifact_id = Column(Integer, ForeignKey("artifacts.id"), primary_key=True, index=True)
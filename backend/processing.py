@@ -0,0 +1,238 @@
+"""Scan processing: job handler, result storage and the standalone worker entry point.
+
+Run extra worker processes next to the API with:
+    python -m backend.processing
+"""
+import os
+import signal
+import sys
+import threading
+import time
+
+# Append parent directory to path to import main.py
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import insert
+from sqlalchemy.orm import Session
+
+from backend import models, database
+from backend.cache import ResultCache
+from backend.events import ProgressBroker
+from backend.config import (
+    CACHE_MAX_BYTES, CACHE_MAX_ENTRIES, METRICS_ENABLED, OUTPUT_DIR, PIPELINE_CONFIG,
+    SCAN_MAX_ATTEMPTS, SCAN_RETRY_BACKOFF, SCAN_TIMEOUT, SCAN_WORKERS, STORAGE_GC_INTERVAL,
+    STORAGE_MAX_BYTES, STORAGE_RETENTION_DAYS, UPLOAD_HANDOFF_BYTES, local_path, served_path,
+)
+from backend.job_queue import JobQueue
+from backend.search import create_search_index
+from backend.storage import StorageManager, shard_dir
+from backend.uploads import UploadHandoff
+from backend.worker import JobDispatcher, ScanExecutor
+from metrics import PipelineMetrics
+
+# Re-uploads of the same photo reuse the earlier scan's results
+result_cache = ResultCache(
+    max_entries=CACHE_MAX_ENTRIES,
+    max_bytes=CACHE_MAX_BYTES,
+    resolve_path=local_path,
+)
+
+# The lease outlives a timed-out attempt, so live jobs are never reclaimed
+job_queue = JobQueue(
+    database.SessionLocal,
+    lease_seconds=SCAN_TIMEOUT * 2 + 30,
+    max_attempts=SCAN_MAX_ATTEMPTS,
+    retry_backoff=SCAN_RETRY_BACKOFF,
+)
+
+# Files of every scan, deleted with the scan or by retention and quota
+storage = StorageManager(
+    database.SessionLocal,
+    local_path,
+    retention_days=STORAGE_RETENTION_DAYS,
+    max_bytes=STORAGE_MAX_BYTES,
+    interval=STORAGE_GC_INTERVAL,
+    forget_scan=result_cache.forget_scan,
+    grace_seconds=job_queue.lease_seconds,
+)
+
+# Uploaded bytes waiting for this process's dispatcher, so workers skip re-reading them
+upload_handoff = UploadHandoff(UPLOAD_HANDOFF_BYTES)
+
+# Live progress for SSE subscribers of this process
+progress_broker = ProgressBroker()
+
+# Stage timings of the jobs this process runs, plus queue and cache state
+pipeline_metrics = PipelineMetrics() if METRICS_ENABLED else None
+if pipeline_metrics is not None:
+    def _queue_depth():
+        db = database.SessionLocal()
+        try:
+            return job_queue.depth(db)
+        finally:
+            db.close()
+
+    pipeline_metrics.registry.gauge(
+        'card_reader_queue_depth', 'Scan jobs waiting to be claimed.', _queue_depth)
+    pipeline_metrics.registry.counter(
+        'card_reader_cache_hits_total', 'Uploads answered from the result cache.',
+        lambda: result_cache.hits)
+    pipeline_metrics.registry.counter(
+        'card_reader_cache_misses_total', 'Uploads that had to be processed.',
+        lambda: result_cache.misses)
+
+    def _artifact_bytes():
+        db = database.SessionLocal()
+        try:
+            return storage.total_bytes(db)
+        finally:
+            db.close()
+
+    pipeline_metrics.registry.gauge(
+        'card_reader_artifact_bytes', 'Disk space used by tracked scan files.', _artifact_bytes)
+
+# Per-field OCR events are pushed live but written to the DB at most this often
+PROGRESS_DB_INTERVAL = 1.0
+
+
+def save_scan_result(db: Session, scan: models.Scan, result: dict, output_dir: str = OUTPUT_DIR):
+    """Store pipeline output on a scan: fields and the detected card path.
+
+    Fields are inserted with one multi-row statement in the caller's
+    transaction, which commits them together with the scan.
+    """
+    base_name = result['base_name']
+    rows = []
+    for field_data in result.get('fields', []):
+        # Crops live in {output_dir}/{base_name}_fields/, served under /output
+        relative_path = served_path(field_data['path'])
+
+        rows.append({
+            "scan_id": scan.id,
+            "text": field_data['text'],
+            "x": field_data.get('x', 0),
+            "y": field_data.get('y', 0),
+            "width": field_data.get('width', 0),
+            "height": field_data.get('height', 0),
+            "image_path": relative_path,
+            "confidence": 0.9,  # Mock confidence
+        })
+    if rows:
+        db.execute(insert(models.ScanField), rows)
+
+    # The processor saves `{output_dir}/{base_name}_detected_card.jpg`
+    scan.card_image_path = served_path(os.path.join(output_dir, f"{base_name}_detected_card.jpg"))
+
+
+def process_scan_job(run_pipeline, job: models.Job):
+    """Process a claimed job on an executor supervisor thread with its own DB session."""
+    db = database.SessionLocal()
+    try:
+        scan = db.query(models.Scan).filter(models.Scan.id == job.scan_id).first()
+        # Deleted, or already finished by an earlier claim of a duplicate job
+        if not scan or scan.status == "completed":
+            job_queue.complete(job)
+            return
+
+        last_db_write = 0.0
+
+        def on_progress(stage, percent):
+            nonlocal last_db_write
+            progress_broker.publish(job.scan_id, {"status": stage, "percent": percent})
+            # Other processes only see progress (and the lease renewal) via the DB
+            now = time.monotonic()
+            if not stage.startswith("ocr_field") or now - last_db_write >= PROGRESS_DB_INTERVAL:
+                job_queue.report_progress(job, stage, percent)
+                last_db_write = now
+
+        try:
+            scan.status = "processing"
+            db.commit()
+            on_progress("processing", 1)
+
+            # Outputs are named after the upload's hash, so they are sharded the same way
+            output_dir = shard_dir(OUTPUT_DIR, os.path.splitext(os.path.basename(job.file_path))[0])
+            result = run_pipeline(job.file_path, output_dir, on_progress=on_progress,
+                                  image_bytes=upload_handoff.pop(job.scan_id))
+
+            if result:
+                scan.status = "completed"
+                # The card and field crops are still useful without text
+                scan.error_message = None
+                if result.get('ocr_error'):
+                    scan.error_message = f"OCR failed: {result['ocr_error']}"
+                save_scan_result(db, scan, result, output_dir)
+                storage.track(db, scan, [served_path(path) for path in result.get('artifacts', [])])
+            else:
+                # Deterministic outcome, retrying would not help
+                scan.status = "failed"
+                scan.error_message = "Card detection failed"
+            # Scan, fields and job finish in one write transaction
+            job_queue.complete(job, db)
+            db.commit()
+            progress_broker.publish(job.scan_id, {"status": scan.status, "percent": 100})
+
+        except Exception as e:
+            db.rollback()
+            if not job_queue.holds_claim(db, job):
+                # Our lease expired and another worker owns the scan now
+                print(f"Error processing scan {job.scan_id} after losing its job: {e}")
+                return
+            will_retry = job_queue.fail(job, str(e))
+            scan.status = "pending" if will_retry else "failed"
+            scan.error_message = str(e)
+            db.commit()
+            progress_broker.publish(job.scan_id, {
+                "status": "retrying" if will_retry else "failed",
+                "percent": 0 if will_retry else 100,
+            })
+            print(f"Error processing scan {job.scan_id} (attempt {job.attempts}): {e}")
+            return
+
+        # The scan is already stored; a cache failure only costs a future hit. Failed or
+        # empty OCR is not cached, so the next upload of the photo gets another try.
+        if job.cache_key and scan.status == "completed" and result.get('extracted_texts') \
+                and not result.get('ocr_error'):
+            try:
+                result_cache.store(db, job.cache_key, scan)
+            except Exception as e:
+                db.rollback()
+                print(f"⚠ Could not cache scan {job.scan_id}: {e}")
+    finally:
+        db.close()
+
+
+def create_dispatcher():
+    """Build a dispatcher that feeds queued jobs to a fresh pool of pipeline processes."""
+    executor = ScanExecutor(
+        process_scan_job,
+        PIPELINE_CONFIG,
+        max_workers=SCAN_WORKERS,
+        max_queue=0,
+        job_timeout=SCAN_TIMEOUT,
+        on_stage=pipeline_metrics.stage_finished if pipeline_metrics is not None else None,
+    )
+    return JobDispatcher(job_queue, executor)
+
+
+def main():
+    """Run a standalone worker process against the shared job queue."""
+    models.Base.metadata.create_all(bind=database.engine)
+    database.create_missing_indexes(models.Base.metadata)
+    create_search_index(database.engine)
+    os.makedirs(OUTPUT_DIR, exist_ok=True)
+
+    dispatcher = create_dispatcher()
+    dispatcher.start()
+    print(f"✓ Worker started with {SCAN_WORKERS} processes, waiting for jobs")
+
+    stopped = threading.Event()
+    for signum in (signal.SIGINT, signal.SIGTERM):
+        signal.signal(signum, lambda *_: stopped.set())
+    stopped.wait()
+    print("Stopping worker...")
+    dispatcher.stop()
+
+
+if __name__ == "__main__":
+    main()
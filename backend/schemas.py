@@ -38,3 +38,34 @@ class Scan(ScanBase):
 
     class Config:
         orm_mode = True
+
+class ScanSummary(BaseModel):
+    """What the history list shows of a scan, without its fields."""
+    id: int
+    filename: str
+    status: str
+    created_at: datetime
+    card_image_path: Optional[str] = None
+    field_count: int = 0
+
+    class Config:
+        orm_mode = True
+
+class TextSpan(BaseModel):
+    text: str
+    match: bool = False
+
+class FieldMatch(BaseModel):
+    id: int
+    text: str
+    # The field text in pieces; ``match`` is set on the words the query matched
+    spans: List[TextSpan]
+
+class SearchResult(BaseModel):
+    scan: ScanSummary
+    fields: List[FieldMatch]
+
+class ScanPage(BaseModel):
+    items: List[ScanSummary]
+    # Pass as ``cursor`` to get the next (older) page; None on the last page
+    next_cursor: Optional[str] = None
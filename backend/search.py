@@ -0,0 +1,121 @@
+import re
+import unicodedata
+
+from sqlalchemy import bindparam, text
+from sqlalchemy.orm import Session
+
+# Word characters as the unicode61 tokenizer sees them (underscore separates words)
+_WORD = re.compile(r"[^\W_]+")
+
+
+def _fold_sql(expression):
+    # unicode61 strips ş, ğ, ç, ö, ü and İ to their base letter but leaves the dotless ı
+    return f"replace({expression}, 'ı', 'i')"
+
+
+def _reindex_sql(scan_id):
+    """Statements replacing a scan's search document after its fields changed."""
+    return (
+        f"DELETE FROM scan_search WHERE rowid = {scan_id};"
+        f"INSERT INTO scan_search(rowid, text) SELECT {scan_id},"
+        f" (SELECT group_concat({_fold_sql('text')}, ' ') FROM scan_fields WHERE scan_id = {scan_id})"
+        f" WHERE EXISTS (SELECT 1 FROM scan_fields WHERE scan_id = {scan_id});"
+    )
+
+
+# One FTS5 document per scan (rowid = scan id) holding the text of all its
+# fields, so words found in different fields (name, surname, number) match
+# together. Triggers on scan_fields keep it in sync. The prefix indexes keep
+# short prefix queries from reading every term.
+SEARCH_SCHEMA = [
+    """CREATE VIRTUAL TABLE scan_search USING fts5(
+        text, tokenize="unicode61 remove_diacritics 2", prefix='2 3')""",
+    f"""CREATE TRIGGER IF NOT EXISTS scan_search_insert AFTER INSERT ON scan_fields BEGIN
+        {_reindex_sql('new.scan_id')}
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS scan_search_delete AFTER DELETE ON scan_fields BEGIN
+        {_reindex_sql('old.scan_id')}
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS scan_search_update AFTER UPDATE OF text, scan_id ON scan_fields BEGIN
+        {_reindex_sql('old.scan_id')}
+        {_reindex_sql('new.scan_id')}
+    END""",
+]
+
+
+def create_search_index(engine):
+    """Create the search index and its triggers, indexing existing scans once."""
+    with engine.begin() as connection:
+        exists = connection.execute(text(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'scan_search'"
+        )).first()
+        if exists:
+            return
+        for statement in SEARCH_SCHEMA:
+            connection.execute(text(statement))
+        connection.execute(text(
+            f"INSERT INTO scan_search(rowid, text) SELECT scan_id, group_concat({_fold_sql('text')}, ' ')"
+            " FROM scan_fields WHERE scan_id IS NOT NULL GROUP BY scan_id"
+        ))
+
+
+def fold(value: str) -> str:
+    """Lowercase and strip diacritics the way the index does, so "IŞIK" becomes "isik"."""
+    decomposed = unicodedata.normalize("NFD", value.replace("ı", "i"))
+    return "".join(ch for ch in decomposed if not unicodedata.combining(ch)).lower()
+
+
+def query_terms(query: str):
+    """Folded words of a user query; each one is matched as a word prefix."""
+    return [fold(word) for word in _WORD.findall(query)]
+
+
+def highlight_spans(value: str, terms):
+    """Split field text into ``(text, matched)`` pieces, marking words that start with a term."""
+    spans, position = [], 0
+    for word in _WORD.finditer(value):
+        if fold(word.group()).startswith(tuple(terms)):
+            if word.start() > position:
+                spans.append((value[position:word.start()], False))
+            spans.append((word.group(), True))
+            position = word.end()
+    if position < len(value):
+        spans.append((value[position:], False))
+    return spans
+
+
+def search_fields(db: Session, query: str, max_scans=20, before=None):
+    """Find the newest scans whose fields contain every word of ``query``.
+
+    Returns ``[(scan_id, [(field_id, text, spans), ...]), ...]`` for at most
+    ``max_scans`` scans with ids below ``before``, listing the fields that
+    matched a word. The index is read newest first and stops at the limit,
+    so the cost does not grow with the number of matching scans.
+    """
+    terms = query_terms(query)
+    if not terms:
+        return []
+
+    # Quoted, so punctuation and FTS operators typed by users are taken literally
+    match = " ".join(f'"{term}"*' for term in terms)
+    scan_ids = [scan_id for (scan_id,) in db.execute(text("""
+        SELECT rowid FROM scan_search
+        WHERE scan_search MATCH :match AND rowid < :before
+        ORDER BY rowid DESC
+        LIMIT :max_scans
+    """), {"match": match, "before": before or 2 ** 63 - 1, "max_scans": max_scans})]
+    if not scan_ids:
+        return []
+
+    rows = db.execute(text("""
+        SELECT id, scan_id, text FROM scan_fields
+        WHERE scan_id IN :scan_ids
+        ORDER BY id
+    """).bindparams(bindparam("scan_ids", expanding=True)), {"scan_ids": scan_ids})
+
+    scans = {scan_id: [] for scan_id in scan_ids}
+    for field_id, scan_id, field_text in rows:
+        spans = highlight_spans(field_text or "", terms)
+        if any(matched for _, matched in spans):
+            scans[scan_id].append((field_id, field_text, spans))
+    return list(scans.items())
@@ -0,0 +1,299 @@
+import hashlib
+import os
+import shutil
+import threading
+import time
+import uuid
+from datetime import datetime, timedelta
+
+from sqlalchemy import delete, exists, func, select
+from sqlalchemy.dialects.sqlite import insert
+from sqlalchemy.orm import Session
+
+from backend import models
+
+# Only scans that are done can be removed; queued ones still need their upload
+FINISHED_STATES = ("completed", "failed")
+
+
+def shard_dir(root: str, name: str, levels: int = 2) -> str:
+    """Subdirectory of ``root`` for the files of ``name``, e.g. ``root/3f/a2``.
+
+    Spreading files over 65536 directories (two levels of 256) keeps every
+    directory small however many scans are stored.
+    """
+    digest = hashlib.sha1(name.encode()).hexdigest()
+    return os.path.join(root, *(digest[2 * i:2 * i + 2] for i in range(levels)))
+
+
+def _disk_size(path: str) -> int:
+    if os.path.isdir(path):
+        return sum(entry.stat().st_size for entry in os.scandir(path) if entry.is_file())
+    return os.path.getsize(path)
+
+
+def _modified_at(path: str) -> float:
+    # Rewriting a crop does not touch its directory's mtime, so look at the files too
+    if os.path.isdir(path):
+        return max([os.path.getmtime(path)] +
+                   [entry.stat().st_mtime for entry in os.scandir(path) if entry.is_file()])
+    return os.path.getmtime(path)
+
+
+def _remove(path: str):
+    if os.path.isdir(path):
+        shutil.rmtree(path, ignore_errors=True)
+    else:
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+
+def _restore(moved: str, path: str):
+    """Move ``moved`` back to ``path``, merging with whatever was written there meanwhile."""
+    try:
+        os.rename(moved, path)
+        return
+    except OSError:
+        pass
+    # A directory recreated in the meantime: keep its files, add the missing ones
+    for entry in os.scandir(moved):
+        target = os.path.join(path, entry.name)
+        if not os.path.exists(target):
+            os.replace(entry.path, target)
+    _remove(moved)
+
+
+def _discard(path: str, written_before: float) -> bool:
+    """Delete ``path`` unless it was written after ``written_before``; True if deleted.
+
+    The file is first renamed aside, which atomically takes whatever is at
+    ``path`` at that moment. A file an upload or scan has just (re)written
+    is put back for it to track, instead of being deleted under it.
+    """
+    moved = f"{path}.gc-{uuid.uuid4().hex}"
+    try:
+        os.rename(path, moved)
+    except FileNotFoundError:
+        return True
+    if _modified_at(moved) > written_before:
+        _restore(moved, path)
+        return False
+    _remove(moved)
+    return True
+
+
+class StorageManager:
+    """Tracks the files of every scan and deletes them once no scan uses them.
+
+    Uploads and pipeline outputs are named after the photo's content, so
+    scans of the same photo (and cache clones) share files. Each file (or
+    field crop directory) is an ``Artifact`` linked to the scans using it.
+    ``collect`` deletes finished scans older than ``retention_days``, then
+    the oldest ones while artifacts take more than ``max_bytes``, and a
+    background thread runs it every ``interval`` seconds.
+
+    Files are written before they are tracked (an upload before its scan
+    exists, pipeline outputs before the scan completes), so an unused file
+    written less than ``grace_seconds`` ago is kept for a later collection.
+    """
+
+    def __init__(self, session_factory, resolve_path, retention_days=0, max_bytes=0,
+                 interval=3600, forget_scan=None, batch_size=100, grace_seconds=300):
+        """
+        Args:
+            resolve_path: Maps a stored (served) path to a local file path.
+            forget_scan: Called as ``forget_scan(db, scan_id)`` before a scan
+                is deleted, e.g. to drop result cache entries pointing at it.
+            grace_seconds: At least the time between writing a file and
+                tracking it, i.e. the longest a scan may take.
+        """
+        self.session_factory = session_factory
+        self.resolve_path = resolve_path
+        self.retention_days = retention_days
+        self.max_bytes = max_bytes
+        self.interval = interval
+        self.forget_scan = forget_scan
+        self.batch_size = batch_size
+        self.grace_seconds = grace_seconds
+        self._stop = threading.Event()
+        self._thread = None
+
+    def track(self, db: Session, scan: models.Scan, paths):
+        """Link the files at the served ``paths`` to ``scan``; missing ones are skipped.
+
+        Runs in the caller's transaction, so the links are committed together
+        with the scan.
+        """
+        artifact_ids = self._register(db, paths)
+        if not artifact_ids:
+            return
+        if scan.id is None:
+            db.flush()
+        db.execute(insert(models.ScanArtifact).values([
+            {"scan_id": scan.id, "artifact_id": artifact_id} for artifact_id in artifact_ids
+        ]).on_conflict_do_nothing())
+
+    def track_unused(self, db: Session, paths):
+        """Register files at the served ``paths`` that no scan uses yet.
+
+        A collection deletes them once they are older than ``grace_seconds``,
+        unless a scan tracks them first. Runs in the caller's transaction.
+        """
+        self._register(db, paths)
+
+    def _register(self, db: Session, paths):
+        """Upsert the artifacts of the existing files at ``paths``; returns their ids."""
+        sizes = {}
+        for path in paths:
+            local = self.resolve_path(path)
+            if os.path.exists(local):
+                sizes[path] = _disk_size(local)
+        if not sizes:
+            return []
+
+        now = datetime.utcnow()
+        statement = insert(models.Artifact).values([
+            {"path": path, "size_bytes": size, "created_at": now} for path, size in sizes.items()
+        ])
+        # Another scan of the same photo may have registered (and rewritten) them
+        db.execute(statement.on_conflict_do_update(
+            index_elements=["path"], set_={"size_bytes": statement.excluded.size_bytes}))
+        return db.execute(
+            select(models.Artifact.id).where(models.Artifact.path.in_(list(sizes)))).scalars().all()
+
+    def _delete_scans(self, db: Session, scans):
+        """Delete scans in one transaction; returns the ids of the artifacts they used."""
+        artifact_ids = set()
+        for scan in scans:
+            artifact_ids.update(artifact.id for artifact in scan.artifacts)
+            if self.forget_scan is not None:
+                self.forget_scan(db, scan.id)
+            db.delete(scan)
+        db.commit()
+        return artifact_ids
+
+    def delete_scan(self, db: Session, scan: models.Scan):
+        """Delete a scan with its fields, then the files no other scan uses."""
+        return self.remove_orphans(db, self._delete_scans(db, [scan]))
+
+    def remove_orphans(self, db: Session, artifact_ids=None):
+        """Delete artifacts no scan links to; returns (count, bytes freed).
+
+        Only the given ``artifact_ids`` are checked, or every artifact if None.
+        """
+        linked = exists().where(models.ScanArtifact.artifact_id == models.Artifact.id)
+        query = db.query(models.Artifact.id, models.Artifact.path, models.Artifact.size_bytes) \
+            .filter(~linked)
+        if artifact_ids is not None:
+            if not artifact_ids:
+                return 0, 0
+            query = query.filter(models.Artifact.id.in_(list(artifact_ids)))
+        orphans = query.all()
+
+        removed, freed = 0, 0
+        written_before = time.time() - self.grace_seconds
+        for artifact_id, path, size in orphans:
+            # Only delete the file if the row is still unused when we remove it
+            result = db.execute(delete(models.Artifact).where(models.Artifact.id == artifact_id, ~linked))
+            db.commit()
+            if result.rowcount != 1:
+                continue
+            if _discard(self.resolve_path(path), written_before):
+                removed += 1
+                freed += size or 0
+            else:
+                # Rewritten for a scan that has not tracked it yet; if none does,
+                # a later collection removes it
+                db.execute(insert(models.Artifact).values(
+                    path=path, size_bytes=size, created_at=datetime.utcnow()).on_conflict_do_nothing())
+                db.commit()
+        return removed, freed
+
+    def _finished_scans(self, db: Session):
+        return (db.query(models.Scan)
+                .filter(models.Scan.status.in_(FINISHED_STATES))
+                .order_by(models.Scan.created_at, models.Scan.id))
+
+    def total_bytes(self, db: Session) -> int:
+        return db.query(func.coalesce(func.sum(models.Artifact.size_bytes), 0)).scalar()
+
+    def collect(self):
+        """Apply retention and the size quota once; returns what was deleted."""
+        db = self.session_factory()
+        try:
+            scans_deleted = 0
+            if self.retention_days:
+                cutoff = datetime.utcnow() - timedelta(days=self.retention_days)
+                while True:
+                    expired = (self._finished_scans(db).filter(models.Scan.created_at < cutoff)
+                               .limit(self.batch_size).all())
+                    if not expired:
+                        break
+                    self._delete_scans(db, expired)
+                    scans_deleted += len(expired)
+
+            # Every orphan, including files left by interrupted deletions
+            removed, freed = self.remove_orphans(db)
+
+            if self.max_bytes:
+                while self.total_bytes(db) > self.max_bytes:
+                    oldest = self._finished_scans(db).limit(self.batch_size).all()
+                    if not oldest:
+                        break
+                    count, size = self.remove_orphans(db, self._delete_scans(db, oldest))
+                    scans_deleted += len(oldest)
+                    removed += count
+                    freed += size
+
+            if scans_deleted or removed:
+                print(f"🧹 Storage: deleted {scans_deleted} scans and {removed} files "
+                      f"({freed / 1024 ** 2:.1f} MB)")
+            return {"scans_deleted": scans_deleted, "artifacts_deleted": removed, "bytes_freed": freed}
+        finally:
+            db.close()
+
+    def adopt_untracked(self, db: Session):
+        """Track the files of scans stored before artifacts were tracked."""
+        has_links = exists().where(models.ScanArtifact.scan_id == models.Scan.id)
+        scan_ids = [scan_id for (scan_id,) in db.query(models.Scan.id).filter(~has_links)]
+        for start in range(0, len(scan_ids), self.batch_size):
+            batch = scan_ids[start:start + self.batch_size]
+            for scan in db.query(models.Scan).filter(models.Scan.id.in_(batch)):
+                paths = {scan.original_image_path, scan.card_image_path}
+                if scan.card_image_path:
+                    # Written next to the card by the pipeline
+                    stem = scan.card_image_path[:-len("_detected_card.jpg")]
+                    paths.update((f"{stem}_ocr_results.txt", f"{stem}_annotated.jpg"))
+                paths.update(field.image_path.rsplit("/", 1)[0]
+                             for field in scan.fields if field.image_path)
+                self.track(db, scan, [path for path in paths if path])
+            db.commit()
+        return len(scan_ids)
+
+    def stats(self, db: Session):
+        count, total = db.query(func.count(models.Artifact.id),
+                                func.coalesce(func.sum(models.Artifact.size_bytes), 0)).one()
+        return {
+            "artifacts": count,
+            "size_bytes": total,
+            "max_bytes": self.max_bytes,
+            "retention_days": self.retention_days,
+        }
+
+    def start(self):
+        self._thread = threading.Thread(target=self._loop, name='storage-gc', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+
+    def _loop(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.collect()
+            except Exception as e:
+                print(f"⚠ Storage collection failed: {e}")
@@ -0,0 +1,171 @@
+import hashlib
+import os
+import threading
+import uuid
+from collections import OrderedDict
+
+import cv2
+
+from backend.storage import shard_dir
+
+# Widths thumbnails can be requested at; a fixed set keeps the variants per image bounded
+THUMBNAIL_WIDTHS = (160, 320, 640, 1280)
+
+# Encoder flags and media type per output format
+FORMATS = {
+    "webp": ([cv2.IMWRITE_WEBP_QUALITY, 80], "image/webp"),
+    "jpeg": ([cv2.IMWRITE_JPEG_QUALITY, 85], "image/jpeg"),
+}
+
+# Bump when the rendering changes, so browsers and the disk cache drop old variants
+RENDER_VERSION = "1"
+
+
+class NotAnImageError(Exception):
+    """Raised when a served file cannot be decoded as an image."""
+
+
+class ThumbnailCache:
+    """Resized and re-encoded copies of served images, cached on disk.
+
+    A variant is rendered the first time it is requested and stored under
+    a key derived from the source file (path, size and modification time),
+    the width and the format, so regenerated sources get fresh variants.
+    Files are evicted least-recently-used first once they take more than
+    ``max_bytes``; recency survives restarts through the files' mtimes.
+    """
+
+    def __init__(self, directory: str, roots: dict, max_bytes: int = 256 * 1024 ** 2):
+        """
+        Args:
+            roots: Served path prefix to local directory, e.g. ``{"input": UPLOAD_DIR}``.
+                Only files inside these directories are served.
+        """
+        self.directory = directory
+        self.roots = roots
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries = OrderedDict()  # cache file -> size, least recently used first
+        self._size = 0
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+        self._load()
+
+    def _load(self):
+        files = []
+        for folder, _, names in os.walk(self.directory):
+            for name in names:
+                path = os.path.join(folder, name)
+                if name.endswith(".part"):
+                    # Left by an interrupted render
+                    os.remove(path)
+                    continue
+                stat = os.stat(path)
+                files.append((stat.st_mtime, path, stat.st_size))
+        for _, path, size in sorted(files):
+            self._entries[path] = size
+            self._size += size
+
+    def source_path(self, served_path: str) -> str:
+        """Local file for a served path like ``output/3f/a2/<name>.jpg``.
+
+        Raises FileNotFoundError for paths outside the served directories.
+        """
+        prefix, _, rest = served_path.partition("/")
+        if prefix not in self.roots or not rest:
+            raise FileNotFoundError(served_path)
+        root = os.path.realpath(self.roots[prefix])
+        path = os.path.realpath(os.path.join(root, rest))
+        if os.path.commonpath([root, path]) != root or not os.path.isfile(path):
+            raise FileNotFoundError(served_path)
+        return path
+
+    def etag(self, source: str, width, fmt: str) -> str:
+        """Strong validator of a variant, known without rendering it."""
+        stat = os.stat(source)
+        key = f"{RENDER_VERSION}|{source}|{stat.st_size}|{stat.st_mtime_ns}|{width}|{fmt}"
+        return hashlib.sha256(key.encode()).hexdigest()[:32]
+
+    def get(self, source: str, etag: str, width, fmt: str) -> bytes:
+        """Encoded variant ``etag`` of ``source``, rendered and cached on a miss."""
+        path = os.path.join(shard_dir(self.directory, etag, levels=1), f"{etag}.{fmt}")
+        with self._lock:
+            cached = path in self._entries
+            if cached:
+                self._entries.move_to_end(path)
+        if cached:
+            try:
+                with open(path, "rb") as handle:
+                    data = handle.read()
+                # Recency for the next start's LRU order
+                os.utime(path)
+                self._count(hit=True)
+                return data
+            except FileNotFoundError:
+                pass  # Evicted meanwhile, render it again
+        self._count(hit=False)
+
+        data = self._render(source, width, fmt)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        temp_path = f"{path}.{uuid.uuid4().hex}.part"
+        with open(temp_path, "wb") as handle:
+            handle.write(data)
+        os.replace(temp_path, path)
+        self._add(path, len(data))
+        return data
+
+    def _count(self, hit):
+        with self._lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+    @staticmethod
+    def _render(source: str, width, fmt: str) -> bytes:
+        image = cv2.imread(source, cv2.IMREAD_COLOR)
+        if image is None:
+            raise NotAnImageError(source)
+        height, source_width = image.shape[:2]
+        # Never upscale; without a width only the format changes
+        if width and width < source_width:
+            size = (width, max(1, round(height * width / source_width)))
+            image = cv2.resize(image, size, interpolation=cv2.INTER_AREA)
+        flags, _ = FORMATS[fmt]
+        ok, encoded = cv2.imencode(f".{fmt}", image, flags)
+        if not ok:
+            raise NotAnImageError(source)
+        return encoded.tobytes()
+
+    def _add(self, path: str, size: int):
+        evicted = []
+        with self._lock:
+            # Concurrent renders of the same variant write the same file
+            self._size += size - self._entries.get(path, 0)
+            self._entries[path] = size
+            self._entries.move_to_end(path)
+            while self._size > self.max_bytes and len(self._entries) > 1:
+                old_path, old_size = self._entries.popitem(last=False)
+                self._size -= old_size
+                self.evictions += 1
+                evicted.append(old_path)
+        for old_path in evicted:
+            try:
+                os.remove(old_path)
+            except FileNotFoundError:
+                pass
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "evictions": self.evictions,
+                "entries": len(self._entries),
+                "size_bytes": self._size,
+                "max_bytes": self.max_bytes,
+            }
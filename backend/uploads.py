@@ -0,0 +1,121 @@
+import hashlib
+import os
+import threading
+import uuid
+from collections import OrderedDict
+
+from fastapi import UploadFile
+from fastapi.concurrency import run_in_threadpool
+
+from backend.storage import shard_dir
+
+# Extensions kept on stored uploads; anything else is stored without one
+UPLOAD_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.bmp', '.webp', '.tif', '.tiff')
+
+
+class UploadTooLargeError(Exception):
+    """Raised for an upload that exceeds the size limit."""
+
+
+class StoredUpload:
+    """An upload written to disk under its content hash."""
+
+    def __init__(self, path, name, size, digest, data=None):
+        self.path = path
+        self.name = name
+        self.size = size
+        # sha256 of the content, still open for extending into a cache key
+        self.digest = digest
+        self.data = data
+
+
+def _store(source, filename, directory, temp_directory, max_bytes, chunk_size, keep_data):
+    size = source.seek(0, os.SEEK_END)
+    if size > max_bytes:
+        raise UploadTooLargeError(f"Upload exceeds {max_bytes} bytes")
+    source.seek(0)
+
+    digest = hashlib.sha256()
+    chunks = [] if keep_data else None
+    temp_path = os.path.join(temp_directory, f"upload-{uuid.uuid4().hex}.part")
+    try:
+        with open(temp_path, "wb") as handle:
+            while True:
+                chunk = source.read(chunk_size)
+                if not chunk:
+                    break
+                digest.update(chunk)
+                if chunks is not None:
+                    chunks.append(chunk)
+                handle.write(chunk)
+
+        extension = os.path.splitext(filename or "")[1].lower()
+        if extension not in UPLOAD_EXTENSIONS:
+            extension = ""
+        name = f"{digest.hexdigest()}{extension}"
+        target_dir = shard_dir(directory, digest.hexdigest())
+        os.makedirs(target_dir, exist_ok=True)
+        path = os.path.join(target_dir, name)
+        os.replace(temp_path, path)
+    except BaseException:
+        try:
+            os.remove(temp_path)
+        except FileNotFoundError:
+            pass
+        raise
+    data = b"".join(chunks) if chunks is not None else None
+    return StoredUpload(path, name, size, digest, data)
+
+
+async def save_upload(file: UploadFile, directory: str, temp_directory: str, max_bytes: int,
+                      chunk_size: int = 1024 * 1024, keep_data: bool = False) -> StoredUpload:
+    """Store an upload in ``directory`` without blocking the event loop.
+
+    Starlette has already spooled the body, so it is copied from there in
+    one worker thread: hashed while written under a temporary name in
+    ``temp_directory`` (outside the served directories, on the same
+    filesystem), then renamed to ``<sha256><ext>`` in its ``shard_dir``.
+    Concurrent uploads never overwrite each other and identical photos
+    share one file. Raises ``UploadTooLargeError`` for more than
+    ``max_bytes``, before copying anything. With ``keep_data`` the bytes
+    are also returned in memory.
+    """
+    return await run_in_threadpool(_store, file.file, file.filename, directory, temp_directory,
+                                   max_bytes, chunk_size, keep_data)
+
+
+class UploadHandoff:
+    """Keeps uploaded bytes in memory for the local dispatcher, bounded by size.
+
+    When the job is processed by this process, its worker decodes the bytes
+    directly instead of reading the file again. Jobs claimed elsewhere (or
+    retried after the bytes were taken or evicted) fall back to the file.
+    """
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self._items = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self):
+        return self.max_bytes > 0
+
+    def put(self, scan_id: int, data: bytes):
+        if not self.enabled or len(data) > self.max_bytes:
+            return
+        with self._lock:
+            self._items[scan_id] = data
+            self._size += len(data)
+            # Oldest uploads are the most likely to have been picked up elsewhere
+            while self._size > self.max_bytes:
+                _, evicted = self._items.popitem(last=False)
+                self._size -= len(evicted)
+
+    def pop(self, scan_id: int):
+        with self._lock:
+            data = self._items.pop(scan_id, None)
+            if data is not None:
+                self._size -= len(data)
+            return data
@@ -0,0 +1,350 @@
+import multiprocessing
+import queue
+import threading
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+import cv2
+import numpy as np
+
+from backend.config import PIPELINE_LOG
+from backend.job_queue import worker_identity
+from pipeline_hooks import PipelineHooks
+from pipeline_logging import get_logger, setup_logging
+
+logger = get_logger(__name__)
+
+
+class QueueFullError(Exception):
+    """Raised when the executor already holds as many jobs as it accepts."""
+
+
+class JobTimeoutError(Exception):
+    """Raised when a job exceeds its processing time budget."""
+
+
+class WorkerCrashedError(Exception):
+    """Raised when a worker process dies while processing a job."""
+
+
+# Pipeline instance and progress channel owned by each worker process
+_processor = None
+_events = None
+
+
+class _StageForwarder(PipelineHooks):
+    """Sends finished pipeline stages to the parent as ``('stage', stage, elapsed, info)``."""
+
+    def stage_finished(self, stage, elapsed, info):
+        _events.put(('stage', stage, elapsed, info))
+
+
+def _init_worker(processor_config, events, forward_stages=False):
+    """Build the worker's pipeline once and warm up the OCR engine."""
+    global _processor, _events
+    from main import IDCardProcessor
+
+    setup_logging(PIPELINE_LOG)
+
+    _processor = IDCardProcessor(hooks=[_StageForwarder()] if forward_stages else None,
+                                 **processor_config)
+    _events = events
+    try:
+        _processor.text_extractor.engine
+    except Exception as e:
+        logger.warning("⚠ Could not preload OCR engine: %s", e)
+
+
+def _worker_main(processor_config, events, forward_stages, connection):
+    """Worker process loop: run ``_run_pipeline(*args)`` for each request on ``connection``.
+
+    ``('ready', None)`` is sent once the pipeline is loaded.
+    """
+    _init_worker(processor_config, events, forward_stages)
+    connection.send(('ready', None))
+    while True:
+        try:
+            args = connection.recv()
+        except EOFError:
+            return
+        if args is None:
+            return
+        try:
+            reply = ('ok', _run_pipeline(*args))
+        except Exception as e:
+            reply = ('error', e)
+        try:
+            connection.send(reply)
+        except Exception as e:
+            # e.g. an exception that cannot be pickled
+            connection.send(('error', RuntimeError(f"{type(e).__name__}: {e}")))
+
+
+class _WorkerProcess:
+    """A preloaded pipeline process serving one job at a time over a pipe."""
+
+    def __init__(self, context, initargs):
+        self.connection, child = context.Pipe()
+        self.process = context.Process(target=_worker_main, args=(*initargs, child), daemon=True)
+        self.process.start()
+        child.close()
+        self.ready = False
+
+    @property
+    def alive(self):
+        return self.process.is_alive()
+
+    def wait_ready(self, timeout):
+        """Wait until the pipeline is loaded; raises WorkerCrashedError if it is not in time."""
+        if self.ready:
+            return
+        try:
+            if not self.connection.poll(timeout):
+                raise WorkerCrashedError(f"Worker process did not start within {timeout}s")
+            self.connection.recv()
+        except (EOFError, OSError):
+            raise WorkerCrashedError(f"Worker process exited with code {self.process.exitcode}")
+        self.ready = True
+
+    def call(self, args, timeout):
+        """Run one job; raises JobTimeoutError or WorkerCrashedError if it does not return."""
+        try:
+            self.connection.send(args)
+            if not self.connection.poll(timeout):
+                raise JobTimeoutError(f"Processing timed out after {timeout}s")
+            status, value = self.connection.recv()
+        except (EOFError, OSError):
+            raise WorkerCrashedError(f"Worker process exited with code {self.process.exitcode}")
+        if status == 'error':
+            raise value
+        return value
+
+    def stop(self, kill=False):
+        if kill:
+            self.process.terminate()
+        else:
+            try:
+                self.connection.send(None)
+            except OSError:
+                pass
+        self.process.join(timeout=5)
+        if self.process.is_alive():
+            self.process.kill()
+            self.process.join()
+        self.connection.close()
+
+
+def _decode(image_bytes):
+    """Decode uploaded bytes handed over in memory; None if they are not an image."""
+    return cv2.imdecode(np.frombuffer(image_bytes, dtype=np.uint8), cv2.IMREAD_COLOR)
+
+
+def _run_pipeline(file_path, output_dir, progress_key=None, image_bytes=None):
+    """Process one image in a worker process; drops arrays before returning.
+
+    Progress is sent to the parent as ``('progress', progress_key, stage, percent)``.
+    ``image_bytes`` (the uploaded file's content) saves reading ``file_path``.
+    """
+    callback = None
+    if progress_key is not None:
+        def callback(stage, percent):
+            _events.put(('progress', progress_key, stage, percent))
+
+    image = _decode(image_bytes) if image_bytes is not None else None
+    result = _processor.process_image(file_path, output_dir, progress_callback=callback,
+                                      image=image)
+    # Artifacts must be on disk before the API serves them
+    _processor.flush()
+    if result:
+        result.pop('card_image', None)
+    return result
+
+
+class ScanExecutor:
+    """Runs scan jobs on a bounded pool of preloaded pipeline processes.
+
+    ``handler(run_pipeline, *args)`` runs on a supervisor thread (one per
+    worker process, so the job timeout only covers time spent processing) and
+    calls ``run_pipeline`` to do the CPU-heavy work out of the API process.
+    Each call has a worker process to itself, so a job that times out or
+    crashes its process is the only one affected. Processes are started up
+    front and a lost one is replaced right away; the job timeout starts once
+    a process has loaded its pipeline, which may take up to
+    ``startup_timeout``. At most ``max_workers + max_queue`` jobs are
+    accepted at once; ``submit`` raises ``QueueFullError`` beyond that.
+    ``on_stage(stage, elapsed, info)`` receives the pipeline stage timings of
+    every job when given.
+    """
+
+    def __init__(self, handler, processor_config, max_workers=2, max_queue=16, job_timeout=120,
+                 on_job_done=None, on_stage=None, startup_timeout=300):
+        self.handler = handler
+        self.on_job_done = on_job_done
+        self.on_stage = on_stage
+        self.processor_config = processor_config
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self.job_timeout = job_timeout
+        self.startup_timeout = startup_timeout
+
+        self._context = multiprocessing.get_context('spawn')
+        self._events = self._context.Queue()
+        self._progress_callbacks = {}
+        self._listener = threading.Thread(target=self._listen, name='scan-progress', daemon=True)
+        self._listener.start()
+
+        self._slots = threading.BoundedSemaphore(max_workers + max_queue)
+        self._supervisor = ThreadPoolExecutor(max_workers=max_workers,
+                                              thread_name_prefix='scan-supervisor')
+        # Idle worker processes, loading their pipelines in parallel
+        self._workers = queue.Queue()
+        for _ in range(max_workers):
+            self._workers.put(self._start_worker())
+        self._pending = 0
+        self._pending_lock = threading.Lock()
+
+    def _start_worker(self):
+        # spawn avoids forking a multi-threaded server process
+        return _WorkerProcess(self._context,
+                              (self.processor_config, self._events, self.on_stage is not None))
+
+    def _listen(self):
+        """Forward events from worker processes to their job's callback or ``on_stage``."""
+        while True:
+            event = self._events.get()
+            if event is None:
+                return
+            kind, *args = event
+            if kind == 'stage':
+                callback = self.on_stage
+            else:
+                key, *args = args
+                callback = self._progress_callbacks.get(key)
+            if callback is None:
+                continue
+            try:
+                callback(*args)
+            except Exception as e:
+                logger.warning("⚠ %s callback failed: %s", kind.capitalize(), e)
+
+    @property
+    def has_idle_worker(self):
+        return self.queue_depth < self.max_workers
+
+    @property
+    def queue_depth(self):
+        """Jobs accepted but not finished yet (running or waiting)."""
+        with self._pending_lock:
+            return self._pending
+
+    def submit(self, *args):
+        """Queue a job for ``handler(*args)``; raises QueueFullError when full."""
+        if not self._slots.acquire(blocking=False):
+            raise QueueFullError(f"Processing queue is full ({self.max_workers + self.max_queue} jobs)")
+        with self._pending_lock:
+            self._pending += 1
+        self._supervisor.submit(self._run_job, args)
+
+    def _run_job(self, args):
+        try:
+            self.handler(self.run_pipeline, *args)
+        except Exception as e:
+            logger.error("❌ Scan job %s crashed: %s", args, e)
+        finally:
+            with self._pending_lock:
+                self._pending -= 1
+            self._slots.release()
+            if self.on_job_done is not None:
+                self.on_job_done()
+
+    def run_pipeline(self, file_path, output_dir, on_progress=None, image_bytes=None):
+        """Process an image in the pool, waiting at most ``job_timeout`` seconds.
+
+        ``on_progress(stage, percent)`` is called on a listener thread of this
+        process as the worker reports pipeline stages. ``image_bytes`` hands
+        the file's content to the worker so it does not read it from disk.
+        """
+        progress_key = None
+        if on_progress is not None:
+            progress_key = uuid.uuid4().hex
+            self._progress_callbacks[progress_key] = on_progress
+
+        # There are as many workers as supervisor threads, so one is always free
+        worker = self._workers.get()
+        try:
+            if not worker.alive:
+                worker.stop(kill=True)
+                worker = self._start_worker()
+            try:
+                worker.wait_ready(self.startup_timeout)
+                return worker.call((file_path, output_dir, progress_key, image_bytes),
+                                   self.job_timeout)
+            except (JobTimeoutError, WorkerCrashedError):
+                # Only this job's process is stuck or gone; the others keep running
+                # and its replacement loads while the job's failure is handled
+                worker.stop(kill=True)
+                worker = self._start_worker()
+                raise
+        finally:
+            self._workers.put(worker)
+            self._progress_callbacks.pop(progress_key, None)
+
+    def shutdown(self):
+        self._supervisor.shutdown(wait=True, cancel_futures=True)
+        # Every job has finished, so all workers are idle
+        while True:
+            try:
+                worker = self._workers.get_nowait()
+            except queue.Empty:
+                break
+            worker.stop()
+        self._events.put(None)
+        self._listener.join()
+
+
+class JobDispatcher:
+    """Feeds jobs claimed from a ``JobQueue`` to a ``ScanExecutor``.
+
+    A job is only claimed when a worker process is idle, so waiting jobs stay
+    in the durable queue (where any other dispatcher may take them) rather
+    than in this process's memory.
+    """
+
+    def __init__(self, job_queue, executor, poll_interval=1.0):
+        self.job_queue = job_queue
+        self.executor = executor
+        self.poll_interval = poll_interval
+        self.executor.on_job_done = self.wake
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._loop, name='job-dispatcher', daemon=True)
+        self._thread.start()
+
+    def wake(self):
+        """Check for work now instead of at the next poll."""
+        self._wake.set()
+
+    def stop(self):
+        self._stop.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join()
+        self.executor.shutdown()
+
+    def _loop(self):
+        worker_id = worker_identity()
+        while not self._stop.is_set():
+            self._wake.clear()
+            if self.executor.has_idle_worker:
+                try:
+                    job = self.job_queue.claim(worker_id)
+                except Exception as e:
+                    logger.warning("⚠ Could not claim job: %s", e)
+                    job = None
+                if job is not None:
+                    self.executor.submit(job)
+                    continue
+            self._wake.wait(self.poll_interval)
@@ -0,0 +1,200 @@
+"""Measure scan write throughput of the SQLite storage layer.
+
+Writer processes store synthetic scans the way the job handler does:
+create and enqueue the scan, claim a job, report progress, then save the
+fields, scan and job. Reader processes page through the history at the
+same time. The 'legacy' setup is a default engine that adds fields one
+ORM object at a time and commits the job separately. The 'tuned' setup
+uses create_sqlite_engine (WAL, pragmas, busy timeout) and the bulk
+field insert of save_scan_result.
+
+Usage:
+    python benchmarks/bench_db_writes.py --writers 4 --scans 100 --fields 8
+    python benchmarks/bench_db_writes.py --setups tuned --readers 2
+"""
+import argparse
+import multiprocessing as mp
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import create_engine, func
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import sessionmaker
+
+from backend import models
+from backend.database import Base, create_sqlite_engine
+from backend.job_queue import JobQueue, worker_identity
+from backend.processing import save_scan_result
+from backend.search import create_search_index
+
+SETUPS = ('legacy', 'tuned')
+
+
+def make_engine(url, setup):
+    if setup == 'legacy':
+        return create_engine(url, connect_args={"check_same_thread": False})
+    return create_sqlite_engine(url)
+
+
+def make_result(fields):
+    return {
+        'base_name': 'bench',
+        'fields': [
+            {'text': f'FIELD TEXT {i}', 'x': 250, 'y': 40 * i, 'width': 300, 'height': 30,
+             'path': f'output/bench_fields/250_{40 * i}.jpg'}
+            for i in range(fields)
+        ],
+    }
+
+
+def legacy_save(db, scan, result):
+    """Field storage as it was: one ORM object per field."""
+    for field_data in result['fields']:
+        db.add(models.ScanField(
+            scan_id=scan.id, text=field_data['text'], x=field_data['x'], y=field_data['y'],
+            width=field_data['width'], height=field_data['height'],
+            image_path=field_data['path'], confidence=0.9,
+        ))
+    scan.card_image_path = "output/bench_detected_card.jpg"
+
+
+def locked(error):
+    return 'locked' in str(error) or 'busy' in str(error)
+
+
+def write_scans(url, setup, scans, fields, progress_updates):
+    """Writer process: returns (scans written, lock errors, completion latencies)."""
+    engine = make_engine(url, setup)
+    Session = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    queue = JobQueue(Session)
+    result = make_result(fields)
+    worker_id = worker_identity()
+    written, errors, latencies = 0, 0, []
+
+    for i in range(scans):
+        db = Session()
+        try:
+            scan = models.Scan(filename=f'{worker_id}-{i}.jpg', status="pending",
+                               original_image_path="input/bench.jpg")
+            db.add(scan)
+            db.commit()
+            queue.enqueue(db, scan.id, "input_images/bench.jpg")
+
+            job = queue.claim(worker_id)
+            if job is None:
+                continue
+            scan = db.query(models.Scan).filter(models.Scan.id == job.scan_id).first()
+            scan.status = "processing"
+            db.commit()
+            for step in range(progress_updates):
+                queue.report_progress(job, "ocr_field", int(100 * step / progress_updates))
+
+            start = time.perf_counter()
+            scan.status = "completed"
+            if setup == 'legacy':
+                legacy_save(db, scan, result)
+                db.commit()
+                queue.complete(job)
+            else:
+                save_scan_result(db, scan, result)
+                queue.complete(job, db)
+                db.commit()
+            latencies.append(time.perf_counter() - start)
+            written += 1
+        except OperationalError as e:
+            db.rollback()
+            if not locked(e):
+                raise
+            errors += 1
+        finally:
+            db.close()
+    return written, errors, latencies
+
+
+def read_history(url, setup, stop):
+    """Reader process: pages through the newest scans until ``stop`` is set."""
+    engine = make_engine(url, setup)
+    Session = sessionmaker(bind=engine)
+    pages, errors = 0, 0
+    while not stop.is_set():
+        db = Session()
+        try:
+            field_count = (db.query(func.count(models.ScanField.id))
+                           .filter(models.ScanField.scan_id == models.Scan.id)
+                           .scalar_subquery())
+            (db.query(models.Scan.id, models.Scan.status, field_count)
+             .order_by(models.Scan.created_at.desc(), models.Scan.id.desc()).limit(50).all())
+            pages += 1
+        except OperationalError as e:
+            if not locked(e):
+                raise
+            errors += 1
+        finally:
+            db.close()
+    return pages, errors
+
+
+def run(setup, directory, args):
+    url = f"sqlite:///{os.path.join(directory, f'{setup}.db')}"
+    engine = make_engine(url, setup)
+    Base.metadata.create_all(bind=engine)
+    create_search_index(engine)
+    engine.dispose()
+
+    with mp.Manager() as manager, mp.Pool(args.writers + args.readers) as pool:
+        stop = manager.Event()
+        readers = [pool.apply_async(read_history, (url, setup, stop)) for _ in range(args.readers)]
+        start = time.perf_counter()
+        writers = [pool.apply_async(write_scans, (url, setup, args.scans, args.fields, args.progress))
+                   for _ in range(args.writers)]
+        written = [w.get() for w in writers]
+        elapsed = time.perf_counter() - start
+        stop.set()
+        read = [r.get() for r in readers]
+
+    latencies = [latency for _, _, chunk in written for latency in chunk]
+    return {
+        'scans': sum(w[0] for w in written),
+        'write_errors': sum(w[1] for w in written),
+        'elapsed': elapsed,
+        'p50': np.percentile(latencies, 50) if latencies else float('nan'),
+        'p95': np.percentile(latencies, 95) if latencies else float('nan'),
+        'pages': sum(r[0] for r in read),
+        'read_errors': sum(r[1] for r in read),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--setups', nargs='+', choices=SETUPS, default=list(SETUPS))
+    parser.add_argument('--writers', type=int, default=4, help='concurrent writer processes')
+    parser.add_argument('--readers', type=int, default=1, help='concurrent history readers')
+    parser.add_argument('--scans', type=int, default=100, help='scans stored per writer')
+    parser.add_argument('--fields', type=int, default=8, help='fields per scan')
+    parser.add_argument('--progress', type=int, default=4,
+                        help='progress updates written per scan')
+    args = parser.parse_args()
+
+    header = (f"{'setup':>7} {'scans/s':>8} {'lock errors':>12} {'commit p50 (ms)':>16} "
+              f"{'commit p95 (ms)':>16} {'pages/s':>8} {'read errors':>12}")
+    rows = []
+    with tempfile.TemporaryDirectory() as directory:
+        for setup in args.setups:
+            r = run(setup, directory, args)
+            rows.append(f"{setup:>7} {r['scans'] / r['elapsed']:>8.1f} {r['write_errors']:>12} "
+                        f"{r['p50'] * 1000:>16.2f} {r['p95'] * 1000:>16.2f} "
+                        f"{r['pages'] / r['elapsed']:>8.1f} {r['read_errors']:>12}")
+
+    print(header)
+    for row in rows:
+        print(row)
+
+
+if __name__ == '__main__':
+    main()
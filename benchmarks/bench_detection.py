@@ -0,0 +1,68 @@
+"""Compare full-resolution and downscaled card detection.
+
+Usage:
+    python benchmarks/bench_detection.py --sizes 4032x3024 8000x6000 --long-edge 1280
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from card_detection import CardDetector
+from pipeline_logging import setup_logging
+from synthetic import corner_error, make_student_card, place_card
+
+
+def run(detector, scene, truth, repeats):
+    timings, errors = [], []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        result = detector.detect_card_in_image(scene)
+        timings.append(time.perf_counter() - start)
+        if result['success']:
+            errors.append(corner_error(detector, result['contour'], truth))
+    error = np.mean(errors) if errors else float('nan')
+    return np.median(timings), error, len(errors) / repeats
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', nargs='+', default=['4032x3024', '6000x4000', '8000x6000'],
+                        help='scene sizes as WIDTHxHEIGHT')
+    parser.add_argument('--long-edge', type=int, default=1280,
+                        help='target long edge for downscaled detection')
+    parser.add_argument('--scenes', type=int, default=3, help='random scenes per size')
+    parser.add_argument('--repeats', type=int, default=3, help='timed runs per scene')
+    parser.add_argument('--turns', type=int, nargs='+', default=[0, 1, 2],
+                        help='quarter turns of the card (1 on its side, 2 upside down), cycled over the scenes')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+    setup_logging('silent')
+
+    rng = np.random.default_rng(args.seed)
+    modes = [
+        ('full', CardDetector()),
+        (f'downscaled@{args.long_edge}', CardDetector(detection_long_edge=args.long_edge)),
+    ]
+
+    print(f"{'size':>11} {'mode':>18} {'time (ms)':>10} {'corner err (px)':>16} {'detected':>9}")
+    for size in args.sizes:
+        width, height = (int(v) for v in size.lower().split('x'))
+        stats = {name: [] for name, _ in modes}
+        for i in range(args.scenes):
+            card, _ = make_student_card(rng=rng)
+            scene, truth = place_card(card, (width, height), rng=rng,
+                                      turns=args.turns[i % len(args.turns)])
+            for name, detector in modes:
+                stats[name].append(run(detector, scene, truth, args.repeats))
+        for name, _ in modes:
+            timing, error, rate = (np.nanmean(col) for col in zip(*stats[name]))
+            print(f"{size:>11} {name:>18} {timing * 1000:>10.1f} {error:>16.2f} {rate:>9.0%}")
+
+
+if __name__ == '__main__':
+    main()
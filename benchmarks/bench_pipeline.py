@@ -0,0 +1,202 @@
+"""Run IDCardProcessor end to end on synthetic student cards.
+
+Reports per-stage timings, images/sec, peak RSS, corner error, the share
+of cards that come out upright and OCR character error rate (CER) for each
+scene size. Each size runs in its own process, so its peak RSS is its own.
+Cards lie straight, on their side and upside down in turn (``--turns``),
+besides the small ``--max-angle`` rotation. With ``--template`` it
+also reports how many cards were cropped with the template, and exits
+with an error when that falls below ``--min-template-rate``.
+
+Usage:
+    python benchmarks/bench_pipeline.py --sizes 1600x1200 4032x3024 --cards 10
+    python benchmarks/bench_pipeline.py --batch-ocr --long-edge 1280
+"""
+import argparse
+import multiprocessing
+import os
+import resource
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import cv2
+import numpy as np
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from main import IDCardProcessor
+from pipeline_hooks import PipelineHooks, StageTimings
+from pipeline_logging import setup_logging
+from synthetic import corner_error, make_student_card, place_card
+
+STAGES = ('detection', 'field_extraction', 'ocr', 'ocr_call')
+
+
+class TemplateUse(PipelineHooks):
+    """Counts cards whose fields were cropped with the layout template."""
+
+    def __init__(self):
+        self.cards = 0
+        self.used = 0
+
+    def stage_finished(self, stage, elapsed, info):
+        if stage == 'field_extraction':
+            self.cards += 1
+            self.used += bool(info.get('template'))
+
+
+def peak_rss_mb():
+    """Peak resident set size of this process in MB."""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes
+    return peak / 1024 ** 2 if sys.platform == 'darwin' else peak / 1024
+
+
+def edit_distance(a, b):
+    """Levenshtein distance between two strings."""
+    previous = list(range(len(b) + 1))
+    for i, ca in enumerate(a, 1):
+        current = [i]
+        for j, cb in enumerate(b, 1):
+            current.append(min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (ca != cb)))
+        previous = current
+    return previous[-1]
+
+
+def character_error_rate(expected_lines, found_lines):
+    """Edit distance between the card's text and the OCR output, per expected character."""
+    expected = '\n'.join(expected_lines)
+    found = '\n'.join(line.strip() for line in found_lines)
+    return edit_distance(expected, found) / max(len(expected), 1)
+
+
+def is_upright(card_image, card):
+    """Whether the extracted card matches the rendered ``card`` best without turning it."""
+    found = cv2.cvtColor(card_image, cv2.COLOR_BGR2GRAY)
+    rendered = cv2.cvtColor(card, cv2.COLOR_BGR2GRAY)
+    differences = []
+    for turns in range(4):
+        turned = np.ascontiguousarray(np.rot90(rendered, turns))
+        resized = cv2.resize(found, turned.shape[1::-1], interpolation=cv2.INTER_AREA)
+        differences.append(cv2.absdiff(resized, turned).mean())
+    return int(np.argmin(differences)) == 0
+
+
+def make_scenes(directory, size, count, rng, args):
+    """Write ``count`` synthetic scenes; returns (path, true corners, card text, card) tuples."""
+    scenes = []
+    width, height = size
+    for i in range(count):
+        card, texts = make_student_card(width=args.card_width, rng=rng)
+        scene, corners = place_card(card, size, rng=rng, max_angle=args.max_angle,
+                                    background=('noise', 'gradient')[i % 2],
+                                    turns=args.turns[i % len(args.turns)])
+        path = os.path.join(directory, f'card_{width}x{height}_{i}.jpg')
+        cv2.imwrite(path, scene)
+        scenes.append((path, corners, texts, card))
+    return scenes
+
+
+def run(processor, scenes, output_dir):
+    """Process the scenes once; returns timings, elapsed seconds and accuracy lists."""
+    timings = StageTimings()
+    template_use = TemplateUse()
+    errors, cers, detected, upright = [], [], 0, 0
+    start = time.perf_counter()
+    for path, corners, texts, card in scenes:
+        result = processor.process_image(path, output_dir, hooks=[timings, template_use])
+        if result is None:
+            cers.append(1.0)
+            continue
+        detected += 1
+        upright += is_upright(result['card_image'], card)
+        errors.append(corner_error(processor.detector, result['contour'], corners))
+        cers.append(character_error_rate(texts, result['extracted_texts']))
+    processor.flush()
+    elapsed = time.perf_counter() - start
+    return timings, template_use, elapsed, errors, cers, detected, upright
+
+
+def bench_size(size, index, args):
+    """Benchmark one scene size; returns its table row and (cards, template uses)."""
+    setup_logging('text' if args.verbose else 'silent')
+    rng = np.random.default_rng([args.seed, index])
+    processor = IDCardProcessor(
+        save_crops=False,
+        batch_ocr=args.batch_ocr,
+        detection_long_edge=args.long_edge,
+        orientation_thumbnail=args.orientation_thumbnail,
+        layout_template=args.template,
+    )
+    width, height = (int(v) for v in size.lower().split('x'))
+    with tempfile.TemporaryDirectory() as workdir:
+        scenes = make_scenes(workdir, (width, height), args.cards, rng, args)
+        timings, template_use, elapsed, errors, cers, detected, upright = run(
+            processor, scenes, os.path.join(workdir, 'output'))
+    processor.close()
+
+    summary = timings.summary()
+    row = (f"{size:>11} {len(scenes) / elapsed:>9.2f} {detected / len(scenes):>9.0%} "
+           f"{np.mean(errors) if errors else float('nan'):>16.2f} "
+           f"{upright / max(detected, 1):>8.0%} {np.mean(cers):>6.1%}")
+    if args.template:
+        row += f" {template_use.used / max(template_use.cards, 1):>9.0%}"
+    for stage in STAGES:
+        mean = summary.get(stage, {}).get('mean', float('nan'))
+        row += f' {mean * 1000:>22.1f}'
+    row += f' {peak_rss_mb():>14.0f}'
+    return row, (template_use.cards, template_use.used)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', nargs='+', default=['1600x1200', '4032x3024'],
+                        help='scene sizes as WIDTHxHEIGHT')
+    parser.add_argument('--cards', type=int, default=5, help='random cards per size')
+    parser.add_argument('--card-width', type=int, default=1000, help='width of the rendered card')
+    parser.add_argument('--max-angle', type=float, default=8.0,
+                        help='maximum in-plane rotation of the card in degrees')
+    parser.add_argument('--turns', type=int, nargs='+', default=[0, 1, 2],
+                        help='quarter turns of the card (1 on its side, 2 upside down), cycled over the cards')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--batch-ocr', action='store_true', help='one OCR call per card')
+    parser.add_argument('--long-edge', type=int, default=None,
+                        help='detect the card on a copy downscaled to this long edge')
+    parser.add_argument('--orientation-thumbnail', type=int, default=None,
+                        help='score orientation on a thumbnail with this long edge')
+    parser.add_argument('--template', default=None, help='layout template to crop fields with')
+    parser.add_argument('--min-template-rate', type=float, default=0.9,
+                        help='fail when fewer detected cards than this use the template')
+    parser.add_argument('--verbose', action='store_true', help='show the pipeline log')
+    args = parser.parse_args()
+
+    header = f"{'size':>11} {'images/s':>9} {'detected':>9} {'corner err (px)':>16} {'upright':>8} {'CER':>6}"
+    if args.template:
+        header += f" {'template':>9}"
+    header += ''.join(f' {stage + " (ms)":>22}' for stage in STAGES)
+    header += f" {'peak RSS (MB)':>14}"
+    rows = []
+    template_cards = template_used = 0
+    for index, size in enumerate(args.sizes):
+        # A fresh process per size, so large scenes do not inflate the peak RSS of small ones
+        with ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context('spawn')) as pool:
+            row, (cards, used) = pool.submit(bench_size, size, index, args).result()
+        rows.append(row)
+        template_cards += cards
+        template_used += used
+
+    print(header)
+    for row in rows:
+        print(row)
+
+    if args.template:
+        rate = template_used / max(template_cards, 1)
+        if rate < args.min_template_rate:
+            sys.exit(f"❌ Template '{args.template}' used for {rate:.0%} of cards, "
+                     f"expected at least {args.min_template_rate:.0%}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,121 @@
+"""Measure field text search latency against the number of stored fields.
+
+Fills a temporary database with synthetic Turkish student card fields,
+builds the FTS5 index and times search_fields for several queries next to
+a LIKE scan over scan_fields.
+
+Usage:
+    python benchmarks/bench_search.py --fields 1000000
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import insert, text
+from sqlalchemy.orm import sessionmaker
+
+from backend import models
+from backend.database import Base, create_sqlite_engine
+from backend.search import create_search_index, search_fields
+
+FIRST_NAMES = ('AYŞE', 'MEHMET', 'IŞIL', 'ÇAĞRI', 'İSMAİL', 'ŞEYMA', 'OĞUZ', 'GÜLŞEN', 'EMRE',
+               'ILGIN', 'BÜŞRA', 'ALİ', 'ZEYNEP', 'KORAY', 'ÖZGE')
+LAST_NAMES = ('YILMAZ', 'ÖZTÜRK', 'KAYA', 'DEMİR', 'ŞAHİN', 'ÇELİK', 'YILDIZ', 'AYDIN',
+              'ARSLAN', 'DOĞAN', 'KILIÇ', 'ASLAN', 'ÇETİN', 'KARA', 'KOÇ')
+DEPARTMENTS = ('Bilgisayar Mühendisliği', 'Elektrik-Elektronik Mühendisliği', 'İşletme',
+               'Moleküler Biyoloji ve Genetik', 'Endüstri Mühendisliği', 'Psikoloji')
+
+# (label, query): exact names, diacritic-free spellings, short and long prefixes
+QUERIES = (
+    ('name', 'ÖZTÜRK'),
+    ('folded', 'ozturk'),
+    ('dotless i', 'isil kilic'),
+    ('prefix 2', 'ka'),
+    ('number', '20231'),
+    ('rare', 'zeynep çetin 2019'),
+)
+
+
+def fill(session_factory, fields, rng, batch=20000):
+    """Store scans of five fields each: name, surname, number, department, faculty."""
+    db = session_factory()
+    scans = fields // 5
+    for start in range(0, scans, batch):
+        count = min(batch, scans - start)
+        db.execute(insert(models.Scan), [
+            {"id": start + i + 1, "filename": f"card_{start + i}.jpg", "status": "completed",
+             "original_image_path": "input/bench.jpg"}
+            for i in range(count)
+        ])
+        rows = []
+        for i in range(count):
+            scan_id = start + i + 1
+            number = f"{rng.integers(2015, 2025)}{rng.integers(0, 100000):05d}"
+            for y, value in enumerate((
+                    FIRST_NAMES[rng.integers(len(FIRST_NAMES))],
+                    LAST_NAMES[rng.integers(len(LAST_NAMES))],
+                    number,
+                    DEPARTMENTS[rng.integers(len(DEPARTMENTS))],
+                    'Mühendislik Fakültesi')):
+                rows.append({"scan_id": scan_id, "text": value, "x": 300, "y": 40 * y,
+                             "width": 200, "height": 30, "image_path": "output/f.jpg"})
+        db.execute(insert(models.ScanField), rows)
+        db.commit()
+    db.close()
+    return scans * 5
+
+
+def time_query(run, repeats):
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        found = run()
+        timings.append(time.perf_counter() - start)
+    return np.median(timings) * 1000, found
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--fields', type=int, default=500000, help='fields to store')
+    parser.add_argument('--limit', type=int, default=20, help='scans returned per query')
+    parser.add_argument('--repeats', type=int, default=20)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        engine = create_sqlite_engine(f"sqlite:///{os.path.join(directory, 'search.db')}")
+        Base.metadata.create_all(bind=engine)
+        Session = sessionmaker(bind=engine)
+
+        start = time.perf_counter()
+        stored = fill(Session, args.fields, np.random.default_rng(args.seed))
+        fill_time = time.perf_counter() - start
+        start = time.perf_counter()
+        create_search_index(engine)
+        index_time = time.perf_counter() - start
+        print(f"Stored {stored} fields in {fill_time:.1f}s, indexed them in {index_time:.1f}s\n")
+
+        db = Session()
+        print(f"{'query':>10} {'text':>20} {'scans':>6} {'fts (ms)':>9} {'like (ms)':>10}")
+        for label, query in QUERIES:
+            fts_ms, found = time_query(lambda: search_fields(db, query, max_scans=args.limit),
+                                       args.repeats)
+            # What a search without the index costs: a scan of every field
+            like = text("SELECT DISTINCT scan_id FROM scan_fields WHERE text LIKE :pattern "
+                        "ORDER BY scan_id DESC LIMIT :limit")
+            like_ms, _ = time_query(lambda: db.execute(
+                like, {"pattern": f"%{query.split()[0]}%", "limit": args.limit}).all(),
+                max(1, args.repeats // 5))
+            print(f"{label:>10} {query:>20} {len(found):>6} {fts_ms:>9.2f} {like_ms:>10.2f}")
+        db.close()
+        engine.dispose()
+
+
+if __name__ == '__main__':
+    main()
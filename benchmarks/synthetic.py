@@ -0,0 +1,122 @@
+import cv2
+import numpy as np
+
+from card_detection import CARD_ASPECT
+
+WORDS = ('AHMET', 'AYSE', 'MEHMET', 'ZEYNEP', 'MUSTAFA', 'ELIF', 'YILMAZ', 'KAYA', 'DEMIR',
+         'CELIK', 'SAHIN', 'OZTURK', 'ARSLAN', 'DOGAN', 'BILGISAYAR', 'ELEKTRIK', 'MAKINE',
+         'MUHENDISLIGI', 'FAKULTESI', 'OGRENCI')
+
+
+def _random_line(rng, max_chars):
+    """Random words and a student number, at most ``max_chars`` long."""
+    words = []
+    while True:
+        word = str(rng.integers(10 ** 8, 10 ** 9)) if rng.random() < 0.2 else rng.choice(WORDS)
+        if len(' '.join(words + [word])) > max_chars:
+            return ' '.join(words) or word[:max_chars]
+        words.append(word)
+
+
+def make_student_card(width=1000, rng=None, lines=4, max_chars=16):
+    """Render a student card with known text where ``FieldExtractor`` expects it.
+
+    The logo sits in the top-left corner, a colour band on the left edge and
+    the photo in the bottom-right, the regions the field extractor masks out.
+    A header and ``lines`` text lines fill the rest, starting at 30% of the
+    card width or more so the OCR x threshold keeps them. Returns the card and the
+    rendered lines from top to bottom.
+    """
+    rng = rng or np.random.default_rng()
+    height = int(round(width / CARD_ASPECT))
+    card = np.full((height, width, 3), 240, dtype=np.uint8)
+
+    def rect(x0, y0, x1, y1, color):
+        cv2.rectangle(card, (int(width * x0), int(height * y0)),
+                      (int(width * x1), int(height * y1)), color, cv2.FILLED)
+
+    rect(0.02, 0.03, 0.1, 0.97, (150, 60, 30))     # left band
+    rect(0.13, 0.04, 0.28, 0.17, (40, 40, 160))     # logo
+    rect(0.7, 0.45, 0.95, 0.92, (120, 90, 60))     # photo
+
+    font_scale = width / 1200
+    thickness = max(1, int(round(font_scale * 2)))
+    texts = [_random_line(rng, max_chars + 4)] + [_random_line(rng, max_chars) for _ in range(lines)]
+    positions = [0.13] + [0.32 + 0.5 * i / max(lines - 1, 1) for i in range(lines)]
+    for i, (text, y) in enumerate(zip(texts, positions)):
+        x = 0.36 if i == 0 else 0.3
+        cv2.putText(card, text, (int(width * x), int(height * y)), cv2.FONT_HERSHEY_SIMPLEX,
+                    font_scale, (20, 20, 20), thickness, cv2.LINE_AA)
+    return card, texts
+
+
+def make_background(scene_size, rng=None, kind='noise'):
+    """Desk-like background: blurred ``noise`` or a lit ``gradient``."""
+    rng = rng or np.random.default_rng()
+    scene_w, scene_h = scene_size
+    if kind == 'gradient':
+        low, high = sorted(rng.integers(30, 110, size=2))
+        ramp = np.linspace(low, high, scene_w, dtype=np.float32)
+        tint = rng.uniform(0.8, 1.0, size=3).astype(np.float32)
+        background = np.broadcast_to(ramp[None, :, None] * tint, (scene_h, scene_w, 3))
+        return np.ascontiguousarray(background, dtype=np.uint8)
+    background = rng.integers(40, 90, size=(scene_h, scene_w, 3), dtype=np.uint8)
+    return cv2.GaussianBlur(background, (0, 0), sigmaX=max(scene_w, scene_h) / 200)
+
+
+def place_card(card, scene_size, rng=None, card_fraction=0.6, jitter=0.08, noise=6.0,
+               max_angle=0.0, background='noise', turns=0):
+    """Perspective-warp ``card`` onto a background.
+
+    The card is first turned ``turns`` quarter turns counterclockwise (1
+    lies it on its side, 2 puts it upside down), then rotated by up to
+    ``max_angle`` degrees around the scene centre. Returns the scene and the
+    ground-truth card corners in the scene, in the card's own top-left,
+    top-right, bottom-right, bottom-left order.
+    """
+    rng = rng or np.random.default_rng()
+    scene_w, scene_h = scene_size
+    turns %= 4
+    card = np.ascontiguousarray(np.rot90(card, turns))
+    card_h, card_w = card.shape[:2]
+
+    background = make_background(scene_size, rng, background)
+
+    # Card centred in the scene, then each corner pushed around a little
+    target_w = scene_w * card_fraction
+    target_h = target_w / CARD_ASPECT
+    if turns % 2:
+        target_w, target_h = target_h, target_w
+    cx, cy = scene_w / 2, scene_h / 2
+    corners = np.array([
+        [cx - target_w / 2, cy - target_h / 2],
+        [cx + target_w / 2, cy - target_h / 2],
+        [cx + target_w / 2, cy + target_h / 2],
+        [cx - target_w / 2, cy + target_h / 2],
+    ], dtype=np.float32)
+    corners += rng.uniform(-jitter, jitter, size=(4, 2)).astype(np.float32) * min(target_w, target_h)
+    if max_angle:
+        angle = np.deg2rad(rng.uniform(-max_angle, max_angle))
+        rotation = np.array([[np.cos(angle), -np.sin(angle)], [np.sin(angle), np.cos(angle)]],
+                            dtype=np.float32)
+        corners = (corners - [cx, cy]) @ rotation.T + [cx, cy]
+        corners = corners.astype(np.float32)
+
+    src = np.array([[0, 0], [card_w - 1, 0], [card_w - 1, card_h - 1], [0, card_h - 1]],
+                   dtype=np.float32)
+    M = cv2.getPerspectiveTransform(src, corners)
+    scene = cv2.warpPerspective(card, M, (scene_w, scene_h), dst=background,
+                                borderMode=cv2.BORDER_TRANSPARENT)
+
+    if noise:
+        noisy = scene.astype(np.int16) + rng.normal(0, noise, scene.shape).astype(np.int16)
+        scene = np.clip(noisy, 0, 255).astype(np.uint8)
+    # The turned card's corners, back in the card's own order
+    return scene, np.roll(corners, turns, axis=0)
+
+
+def corner_error(detector, contour, truth):
+    """Mean distance in pixels between detected and true corners."""
+    detected = detector._order_points(contour.reshape(4, 2).astype(np.float32))
+    expected = detector._order_points(np.asarray(truth, dtype=np.float32))
+    return float(np.linalg.norm(detected - expected, axis=1).mean())
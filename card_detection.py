@@ -1,62 +1,99 @@
 import cv2
 import numpy as np
 
+from debug_sink import make_debug_sink
+from pipeline_logging import get_logger
+
+logger = get_logger(__name__)
+
+# ISO/IEC 7810 ID-1 aspect ratio (85.60 x 53.98 mm)
+CARD_ASPECT = 85.60 / 53.98
+# Width of the canonical working resolution; field extraction constants are tuned for it
+WORKING_WIDTH = 1000
+
 
 class CardDetector:
     """Detects and extracts ID cards from images."""
     
-    def __init__(self, debug_mode=False):
+    def __init__(self, debug_mode=False, detection_long_edge=None, orientation_thumbnail=None,
+                 debug_sink=None, canny_thresholds=(30, 200), card_width=WORKING_WIDTH):
+        """
+        Args:
+            debug_mode: Show intermediate images in windows, unless a
+                ``debug_sink`` is given.
+            debug_sink: ``DebugSink`` receiving the gray, blurred, edge,
+                detection and extracted card images.
+            detection_long_edge: If set, search for the card outline on a copy
+                downscaled so its longer side is at most this many pixels. The
+                perspective warp still samples the original full-resolution image.
+            orientation_thumbnail: If set, score the card's text orientation on
+                a thumbnail with this long edge instead of the full warped card.
+            canny_thresholds: (low, high) hysteresis thresholds of the edge
+                detection used to find the card outline.
+            card_width: Warp the card straight to this width at the ID-1
+                aspect ratio, so later stages work at a fixed resolution
+                whatever the photo size. None keeps the card's size in the photo.
+        """
         self.debug_mode = debug_mode
+        self.debug = debug_sink or make_debug_sink(debug_mode)
+        self.detection_long_edge = detection_long_edge
+        self.orientation_thumbnail = orientation_thumbnail
+        self.canny_thresholds = tuple(canny_thresholds)
+        self.card_width = card_width
     
-    def _show_image(self, window_name, image, max_width=1200, max_height=800):
-        """Display image in a window with automatic resizing to fit screen."""
-        if not self.debug_mode:
-            return
-            
-        h, w = image.shape[:2]
-        scale_width = max_width / w
-        scale_height = max_height / h
-        scale = min(scale_width, scale_height, 1.0)
-        new_width = int(w * scale)
-        new_height = int(h * scale)
-        
-        if scale < 1.0:
-            resized = cv2.resize(image, (new_width, new_height), interpolation=cv2.INTER_AREA)
-            cv2.imshow(window_name, resized)
-        else:
-            cv2.imshow(window_name, image)
-        
-        # Wait for key press to continue
-        print(f"  [DEBUG] Showing '{window_name}' - Press any key to continue...")
-        cv2.waitKey(0)
+    def _downscale(self, image):
+        """Shrink image for contour search; returns (small_image, scale)."""
+        height, width = image.shape[:2]
+        long_edge = max(height, width)
+        if not self.detection_long_edge or long_edge <= self.detection_long_edge:
+            return image, 1.0
+        
+        small = image
+        # Halve with a Gaussian pyramid while that stays above the target ...
+        while max(small.shape[:2]) // 2 >= self.detection_long_edge:
+            small = cv2.pyrDown(small)
+        # ... then resize the remainder exactly
+        scale = self.detection_long_edge / long_edge
+        target = (max(1, round(width * scale)), max(1, round(height * scale)))
+        if (small.shape[1], small.shape[0]) != target:
+            small = cv2.resize(small, target, interpolation=cv2.INTER_AREA)
+        return small, scale
     
     def detect_card(self, image_path):
         """Main function to detect ID card and return straightened card image."""
         image = cv2.imread(image_path)
         if image is None:
-            print(f"❌ Error: Could not load image from {image_path}")
+            logger.error("❌ Error: Could not load image from %s", image_path)
             return {'success': False}
         
-        print(f"✓ Loaded image: {image.shape[1]}x{image.shape[0]} pixels")
-        original_with_detection = image.copy()
+        logger.info("✓ Loaded image: %dx%d pixels", image.shape[1], image.shape[0])
+        return self.detect_card_in_image(image)
+    
+    def detect_card_in_image(self, image):
+        """Detect the ID card in an already decoded BGR image."""
+        image_size = (image.shape[1], image.shape[0])
+        
+        # Contours are searched on a (possibly) downscaled copy
+        detect_image, scale = self._downscale(image)
+        if scale < 1.0:
+            logger.debug("✓ Detecting on %dx%d copy", detect_image.shape[1], detect_image.shape[0])
+        area_scale = scale * scale
         
         # Preprocessing
-        gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+        gray = cv2.cvtColor(detect_image, cv2.COLOR_BGR2GRAY)
         blurred = cv2.bilateralFilter(gray, 11, 17, 17)
         
-        if self.debug_mode:
-            self._show_image('Grayscale', gray)
-            self._show_image('Blurred', blurred)
+        self.debug.emit('Grayscale', gray)
+        self.debug.emit('Blurred', blurred)
         
         # Edge Detection
-        edges = cv2.Canny(blurred, 30, 200)
-        if self.debug_mode:
-            self._show_image('Edges', edges)
+        edges = cv2.Canny(blurred, *self.canny_thresholds)
+        self.debug.emit('Edges', edges)
         
         # Find Contours
-        contours, _ = cv2.findContours(edges.copy(), cv2.RETR_TREE, cv2.CHAIN_APPROX_SIMPLE)
+        contours, _ = cv2.findContours(edges, cv2.RETR_TREE, cv2.CHAIN_APPROX_SIMPLE)
         contours = sorted(contours, key=cv2.contourArea, reverse=True)[:10]
-        print(f"✓ Found {len(contours)} contours")
+        logger.debug("✓ Found %d contours", len(contours))
         
         # Find the card contour
         card_contour = None
@@ -66,48 +103,55 @@ class CardDetector:
             
             if len(approx) == 4:
                 area = cv2.contourArea(contour)
-                if area > 10000:
+                if area > 10000 * area_scale:
                     card_contour = approx
-                    print(f"✓ Found card contour (#{i}) with area: {area:.0f}")
+                    logger.info("✓ Found card contour (#%d) with area: %.0f", i, area)
                     break
         
-        if card_contour is None:
-            print("❌ Could not detect a rectangular card")
-            card_contour = self._fallback_detection(edges, contours)
+        used_fallback = card_contour is None
+        if used_fallback:
+            logger.warning("❌ Could not detect a rectangular card")
+            card_contour = self._fallback_detection(edges, contours, min_area=5000 * area_scale)
             if card_contour is None:
-                return {'success': False, 'original': image}
+                return {'success': False, 'image_size': image_size}
+        
+        # Map corners back onto the full-resolution image (pixel-centre aligned)
+        corners = card_contour.reshape(4, 2).astype(np.float32)
+        if scale < 1.0:
+            corners = (corners + 0.5) / scale - 0.5
+            card_contour = np.intp(np.round(corners)).reshape(card_contour.shape)
         
-        cv2.drawContours(original_with_detection, [card_contour], -1, (0, 255, 0), 3)
-        if self.debug_mode:
-            self._show_image('Detected Card', original_with_detection)
+        if self.debug.enabled:
+            original_with_detection = image.copy()
+            cv2.drawContours(original_with_detection, [card_contour], -1, (0, 255, 0), 3)
+            self.debug.emit('Detected Card', original_with_detection)
         
         # Apply perspective transform
-        card_image = self._four_point_transform(image, card_contour.reshape(4, 2))
-        print(f"✓ Card extracted: {card_image.shape[1]}x{card_image.shape[0]} pixels")
+        card_image = self._four_point_transform(image, corners)
+        logger.info("✓ Card extracted: %dx%d pixels", card_image.shape[1], card_image.shape[0])
         
-        # Show final extracted card in debug mode
-        if self.debug_mode:
-            self._show_image('Final Extracted Card', card_image)
-            cv2.destroyAllWindows()  # Close all debug windows after showing final result
+        self.debug.emit('Final Extracted Card', card_image)
         
         return {
             'success': True,
             'card_image': card_image,
-            'original': original_with_detection,
-            'contour': card_contour
+            'image_size': image_size,
+            'contour': card_contour,
+            'fallback': used_fallback
         }
     
-    def _fallback_detection(self, edges, contours):
+    def _fallback_detection(self, edges, contours, min_area=5000):
         """Fallback method with relaxed parameters."""
-        print("⚠ Trying fallback detection with relaxed parameters...")
+        logger.info("⚠ Trying fallback detection with relaxed parameters...")
         for i, contour in enumerate(contours):
             peri = cv2.arcLength(contour, True)
             approx = cv2.approxPolyDP(contour, 0.03 * peri, True)
             
             if 4 <= len(approx) <= 6:
                 area = cv2.contourArea(contour)
-                if area > 5000:
-                    print(f"✓ Found card with fallback (#{i}): {len(approx)} corners, area: {area:.0f}")
+                if area > min_area:
+                    logger.info("✓ Found card with fallback (#%d): %d corners, area: %.0f",
+                                i, len(approx), area)
                     if len(approx) > 4:
                         rect = cv2.minAreaRect(contour)
                         box = cv2.boxPoints(rect)
@@ -139,6 +183,18 @@ class CardDetector:
         heightB = np.sqrt(((tl[0] - bl[0]) ** 2) + ((tl[1] - bl[1]) ** 2))
         maxHeight = max(int(heightA), int(heightB))
         
+        # Fixed output size; a portrait card is rotated to landscape later
+        target = None
+        if self.card_width:
+            long_side, short_side = self.card_width, int(round(self.card_width / CARD_ASPECT))
+            target = (short_side, long_side) if maxHeight > maxWidth else (long_side, short_side)
+            # Warping samples single pixels; shrink large cards in two steps to avoid aliasing
+            if max(maxWidth, maxHeight) <= 2 * long_side:
+                maxWidth, maxHeight = target
+                target = None
+            else:
+                maxWidth, maxHeight = target[0] * 2, target[1] * 2
+        
         dst = np.array([
             [0, 0],
             [maxWidth - 1, 0],
@@ -147,47 +203,51 @@ class CardDetector:
         
         M = cv2.getPerspectiveTransform(rect, dst)
         warped = cv2.warpPerspective(image, M, (maxWidth, maxHeight))
+        if target is not None:
+            warped = cv2.resize(warped, target, interpolation=cv2.INTER_AREA)
         warped = self._auto_rotate_card(warped)
         return warped
     
     def _auto_rotate_card(self, card_image):
-        """Automatically rotate card to correct orientation."""
-        height, width = card_image.shape[:2]
+        """Automatically rotate card to correct orientation.
         
-        if height > width:
-            card_image = cv2.rotate(card_image, cv2.ROTATE_90_CLOCKWISE)
-            height, width = card_image.shape[:2]
-            print("  ↻ Rotated card to landscape orientation")
+        Both candidate orientations are scored from a single grayscale/edge
+        pass over the unrotated card, and the image is rotated at most once.
+        """
+        height, width = card_image.shape[:2]
+        portrait = height > width
         
-        orientations = [
-            ('original', card_image),
-            ('180°', cv2.rotate(card_image, cv2.ROTATE_180))
-        ]
+        gray = cv2.cvtColor(card_image, cv2.COLOR_BGR2GRAY)
+        if self.orientation_thumbnail and max(height, width) > self.orientation_thumbnail:
+            scale = self.orientation_thumbnail / max(height, width)
+            gray = cv2.resize(gray, (max(1, round(width * scale)), max(1, round(height * scale))),
+                              interpolation=cv2.INTER_AREA)
+        edges = cv2.Canny(gray, 50, 150)
         
-        best_score = -1
-        best_orientation = card_image
-        best_name = 'original'
+        # Edge pixels per row of the landscape card. A clockwise quarter turn
+        # maps column i of a portrait card onto row i.
+        row_edges = np.count_nonzero(edges, axis=0 if portrait else 1)
+        upright_score = self._calculate_text_score(row_edges)
+        flipped_score = self._calculate_text_score(row_edges[::-1])
+        flip = flipped_score > upright_score
         
-        for name, oriented_img in orientations:
-            score = self._calculate_text_score(oriented_img)
-            if score > best_score:
-                best_score = score
-                best_orientation = oriented_img
-                best_name = name
+        if portrait:
+            logger.info("  ↻ Rotated card to landscape orientation")
+            rotation = cv2.ROTATE_90_COUNTERCLOCKWISE if flip else cv2.ROTATE_90_CLOCKWISE
+        else:
+            rotation = cv2.ROTATE_180 if flip else None
         
-        if best_name != 'original':
-            print(f"  ↻ Rotated card {best_name} for correct text orientation")
+        if flip:
+            logger.info("  ↻ Rotated card 180° for correct text orientation")
         
-        return best_orientation
+        if rotation is None:
+            return card_image
+        return cv2.rotate(card_image, rotation)
     
-    def _calculate_text_score(self, image):
-        """Calculate score for text orientation."""
-        gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
-        edges = cv2.Canny(gray, 50, 150)
-        height, width = edges.shape
-        top_third = edges[0:height//3, :]
-        middle_third = edges[height//3:2*height//3, :]
-        top_edges = np.sum(top_third > 0)
-        middle_edges = np.sum(middle_third > 0)
+    def _calculate_text_score(self, row_edges):
+        """Calculate score for text orientation from per-row edge counts."""
+        height = len(row_edges)
+        top_edges = row_edges[0:height//3].sum()
+        middle_edges = row_edges[height//3:2*height//3].sum()
         score = (top_edges * 2.0) + (middle_edges * 1.0)
-        return score
\ No newline at end of file
+        return score
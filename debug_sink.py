@@ -0,0 +1,116 @@
+import os
+import re
+
+import cv2
+
+from pipeline_logging import get_logger
+
+logger = get_logger(__name__)
+
+
+class DebugSink:
+    """Receives intermediate pipeline images; this base sink discards them.
+
+    Stages check ``enabled`` before building images that only exist for
+    debugging, so a disabled sink costs no copies or drawing.
+    ``begin(name)`` and ``end()`` bracket the images of one input photo.
+    """
+
+    enabled = False
+
+    def begin(self, name):
+        pass
+
+    def emit(self, stage, image):
+        pass
+
+    def end(self):
+        pass
+
+
+NULL_SINK = DebugSink()
+
+
+class WindowSink(DebugSink):
+    """Shows each image in a window and waits for a key press (interactive only)."""
+
+    enabled = True
+
+    def __init__(self, max_width=1200, max_height=800):
+        self.max_width = max_width
+        self.max_height = max_height
+
+    def emit(self, stage, image):
+        h, w = image.shape[:2]
+        scale = min(self.max_width / w, self.max_height / h, 1.0)
+        if scale < 1.0:
+            image = cv2.resize(image, (int(w * scale), int(h * scale)), interpolation=cv2.INTER_AREA)
+        logger.info("  [DEBUG] Showing '%s' - Press any key to continue...", stage)
+        cv2.imshow(stage, image)
+        cv2.waitKey(0)
+
+    def end(self):
+        cv2.destroyAllWindows()
+
+
+class FileSink(DebugSink):
+    """Writes each image to ``directory/<photo name>/<seq>_<stage>.png``.
+
+    Images are written immediately, since stages keep modifying some of
+    them (e.g. the threshold image is masked in place).
+    """
+
+    enabled = True
+
+    def __init__(self, directory, extension='.png'):
+        self.directory = directory
+        self.extension = extension
+        self._current = None
+        self._seq = 0
+
+    def begin(self, name):
+        self._current = os.path.join(self.directory, name)
+        self._seq = 0
+        os.makedirs(self._current, exist_ok=True)
+
+    def emit(self, stage, image):
+        if self._current is None:
+            self.begin('unnamed')
+        self._seq += 1
+        slug = re.sub(r'[^a-z0-9]+', '_', stage.lower()).strip('_')
+        path = os.path.join(self._current, f'{self._seq:02d}_{slug}{self.extension}')
+        if not cv2.imwrite(path, image):
+            logger.warning("⚠ Warning: Could not write %s", path)
+
+    def end(self):
+        self._current = None
+
+
+class MemorySink(DebugSink):
+    """Keeps copies of the images as ``bundles[photo name][stage]`` for inspection or tests."""
+
+    enabled = True
+
+    def __init__(self):
+        self.bundles = {}
+        self._current = None
+
+    def begin(self, name):
+        self._current = self.bundles.setdefault(name, {})
+
+    def emit(self, stage, image):
+        if self._current is None:
+            self.begin('unnamed')
+        self._current[stage] = image.copy()
+
+    def end(self):
+        self._current = None
+
+
+def make_debug_sink(debug_mode=False, debug_dir=None):
+    """Sink for the processor options: files under ``debug_dir``, windows, or none."""
+    if debug_dir:
+        return FileSink(debug_dir)
+    if debug_mode:
+        return WindowSink()
+    return NULL_SINK
@@ -1,37 +1,62 @@
 import os
 import cv2
 
+from artifact_writer import ArtifactWriter
+from card_detection import WORKING_WIDTH
+from debug_sink import make_debug_sink
+from layout_templates import get_template
+from pipeline_logging import get_logger
+
+logger = get_logger(__name__)
+
 
 class FieldExtractor:
     """Extracts text fields from ID cards."""
     
-    def __init__(self, debug_mode=False):
+    def __init__(self, debug_mode=False, save_crops=True, writer=None, template=None,
+                 save_annotated=False, debug_sink=None, dilation_kernel=(20, 4),
+                 min_box_size=(30, 10), reference_width=WORKING_WIDTH):
+        """
+        Args:
+            template: Optional ``LayoutTemplate`` (or the name of one in the
+                ``templates/`` registry) used to crop fields directly.
+            save_annotated: Write ``{base_name}_annotated.jpg`` with the field
+                boxes drawn on the card.
+            debug_sink: ``DebugSink`` receiving the threshold, masked, dilated
+                and annotated images; windows are shown in ``debug_mode``.
+            dilation_kernel: (width, height) of the kernel that joins the
+                characters of a text line into one box.
+            min_box_size: Smallest (width, height) kept as a field.
+            reference_width: Card width the pixel sizes above are given for;
+                they are scaled to the actual card width. None uses them as given.
+        """
         self.debug_mode = debug_mode
+        self.debug = debug_sink or make_debug_sink(debug_mode)
+        self.save_crops = save_crops
+        self.save_annotated = save_annotated
+        self.dilation_kernel = tuple(dilation_kernel)
+        self.min_box_size = tuple(min_box_size)
+        self.reference_width = reference_width
+        self.writer = writer or ArtifactWriter(async_writes=False)
+        if isinstance(template, str):
+            template = get_template(template)
+        self.template = template
+        self.used_template = False
     
-    def _show_debug_image(self, window_name, image):
-        """Show debug image if debug mode is enabled."""
-        if not self.debug_mode:
-            return
-        
-        print(f"  [DEBUG] Showing '{window_name}' - Press any key to continue...")
-        cv2.imshow(window_name, image)
-        cv2.waitKey(0)
-    
-    def extract_fields(self, card_image, base_name, output_dir='output'):
-        """Extract text fields from card image."""
-        fields_dir = os.path.join(output_dir, f'{base_name}_fields')
-        os.makedirs(fields_dir, exist_ok=True)
-        
-        original_image = card_image.copy()
+    def find_text_boxes(self, card_image):
+        """Discover text regions by thresholding, masking and dilation.
         
+        Returns a list of (x, y, w, h) boxes in card coordinates.
+        """
         # Convert to grayscale and threshold
         gray = cv2.cvtColor(card_image, cv2.COLOR_BGR2GRAY)
-        self._show_debug_image('Field Extraction - Grayscale', gray)
+        self.debug.emit('Field Extraction - Grayscale', gray)
         
         _, thresh = cv2.threshold(gray, 0, 255, cv2.THRESH_BINARY_INV + cv2.THRESH_OTSU)
-        self._show_debug_image('Field Extraction - Threshold', thresh)
+        self.debug.emit('Field Extraction - Threshold', thresh)
         
         height, width = thresh.shape[:2]
+        scale = width / self.reference_width if self.reference_width else 1.0
         
         # Mask out non-text regions
         masks = [
@@ -43,41 +68,90 @@ class FieldExtractor:
         for x_start, y_start, x_end, y_end in masks:
             cv2.rectangle(thresh, (x_start, y_start), (x_end, y_end), (0), thickness=cv2.FILLED)
         
-        self._show_debug_image('Field Extraction - After Masking', thresh)
+        self.debug.emit('Field Extraction - After Masking', thresh)
         
         # Dilate to connect characters
-        kernel = cv2.getStructuringElement(cv2.MORPH_RECT, (20, 4))
+        kernel_size = tuple(max(1, int(round(v * scale))) for v in self.dilation_kernel)
+        kernel = cv2.getStructuringElement(cv2.MORPH_RECT, kernel_size)
         dilated = cv2.dilate(thresh, kernel, iterations=1)
-        self._show_debug_image('Field Extraction - Dilated', dilated)
+        self.debug.emit('Field Extraction - Dilated', dilated)
         
         # Find contours
         contours, _ = cv2.findContours(dilated, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
-        print(f"✓ Found {len(contours)} potential text fields")
+        logger.debug("✓ Found %d potential text fields", len(contours))
         
-        field_info = []
+        min_w, min_h = (v * scale for v in self.min_box_size)
+        boxes = []
         for contour in contours:
             x, y, w, h = cv2.boundingRect(contour)
-            
-            if w > 30 and h > 10:
-                cv2.rectangle(original_image, (x, y), (x + w, y + h), (0, 255, 0), 2)
-                
-                padding = 5
-                field_crop = card_image[max(0, y - padding):min(y + h + padding, card_image.shape[0]),
-                                       max(0, x - padding):min(x + w + padding, card_image.shape[1])]
-                
-                filename = f"{x}_{y}.jpg"
-                field_path = os.path.join(fields_dir, filename)
-                cv2.imwrite(field_path, field_crop)
-                field_info.append({'x': x, 'y': y, 'path': field_path})
+            if w > min_w and h > min_h:
+                boxes.append((x, y, w, h))
+        return boxes
+    
+    def _template_boxes(self, card_image):
+        """Field boxes from the layout template, or None if it does not fit this card."""
+        confidence = self.template.alignment_confidence(card_image)
+        if confidence < self.template.min_confidence:
+            logger.warning("⚠ Template '%s' confidence %.2f < %.2f, falling back to contour search",
+                           self.template.name, confidence, self.template.min_confidence)
+            return None
         
-        # Save annotated image
-        annotated_path = os.path.join(output_dir, f'{base_name}_annotated.jpg')
-        cv2.imwrite(annotated_path, original_image)
+        height, width = card_image.shape[:2]
+        logger.info("✓ Using template '%s' (confidence %.2f)", self.template.name, confidence)
+        return [(x, y, w, h) for _, x, y, w, h in self.template.boxes(width, height)]
+    
+    def extract_fields(self, card_image, base_name, output_dir='output'):
+        """Extract text fields from card image.
+
+        Each returned field carries its coordinates and an in-memory ``image``
+        crop (a view into ``card_image``). Crops are additionally persisted
+        under ``path`` when ``save_crops`` is enabled, otherwise ``path`` is None.
+        With a layout template the fields are cropped straight from the
+        template rectangles, skipping the morphology unless alignment fails;
+        ``used_template`` tells which of the two this card took.
+        """
+        fields_dir = os.path.join(output_dir, f'{base_name}_fields')
+        
+        boxes = None
+        if self.template is not None:
+            boxes = self._template_boxes(card_image)
+        self.used_template = boxes is not None
+        if boxes is None:
+            boxes = self.find_text_boxes(card_image)
+        
+        # The annotated copy is only made when someone looks at it
+        annotated = None
+        if self.save_annotated or self.debug.enabled:
+            annotated = card_image.copy()
+        
+        field_info = []
+        for x, y, w, h in boxes:
+            if annotated is not None:
+                cv2.rectangle(annotated, (x, y), (x + w, y + h), (0, 255, 0), 2)
+            
+            padding = 5
+            if self.reference_width:
+                padding = max(1, int(round(5 * card_image.shape[1] / self.reference_width)))
+            field_crop = card_image[max(0, y - padding):min(y + h + padding, card_image.shape[0]),
+                                   max(0, x - padding):min(x + w + padding, card_image.shape[1])]
+            
+            field_path = None
+            if self.save_crops:
+                field_path = os.path.join(fields_dir, f"{x}_{y}.jpg")
+                self.writer.write(field_path, field_crop)
+            field_info.append({
+                'x': x, 'y': y, 'width': w, 'height': h,
+                'image': field_crop, 'path': field_path
+            })
         
-        # Show final annotated image in debug mode
-        if self.debug_mode:
-            self._show_debug_image('Field Extraction - Detected Fields', original_image)
-            cv2.destroyAllWindows()  # Close all debug windows
+        if annotated is not None:
+            self.debug.emit('Field Extraction - Detected Fields', annotated)
+            if self.save_annotated:
+                annotated_path = os.path.join(output_dir, f'{base_name}_annotated.jpg')
+                self.writer.write(annotated_path, annotated)
         
-        print(f"✓ Saved {len(field_info)} field crops to '{fields_dir}'")
-        return field_info
\ No newline at end of file
+        if self.save_crops:
+            logger.info("✓ Saved %d field crops to '%s'", len(field_info), fields_dir)
+        else:
+            logger.info("✓ Extracted %d field crops in memory", len(field_info))
+        return field_info
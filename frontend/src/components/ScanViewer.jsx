@@ -1,5 +1,6 @@
 import React, { useState } from 'react';
 import { MagnifyingGlassPlusIcon } from '@heroicons/react/24/outline';
+import { imageUrl } from '../images';
 
 const ScanViewer = ({ scan }) => {
     const [zoomField, setZoomField] = useState(null);
@@ -34,7 +35,8 @@ const ScanViewer = ({ scan }) => {
 
     if (!scan) return null;
 
-    const cardImageUrl = `http://localhost:8000/${scan.card_image_path}`;
+    // Full size, so the field boxes (in card pixels) line up with naturalWidth
+    const cardImageUrl = imageUrl(scan.card_image_path);
 
     return (
         <div className="grid grid-cols-1 lg:grid-cols-2 gap-8">
@@ -96,7 +98,8 @@ const ScanViewer = ({ scan }) => {
                                 </div>
                                 {field.image_path && (
                                     <img
-                                        src={`http://localhost:8000/${field.image_path}`}
+                                        src={imageUrl(field.image_path, 320)}
+                                        loading="lazy"
                                         alt="Field crop"
                                         className="h-10 w-auto rounded border border-slate-200 object-contain ml-auto"
                                     />
@@ -128,7 +131,7 @@ const ScanViewer = ({ scan }) => {
                         <div className="p-6 text-center">
                             {zoomField.image_path && (
                                 <img
-                                    src={`http://localhost:8000/${zoomField.image_path}`}
+                                    src={imageUrl(zoomField.image_path)}
                                     alt="Field Zoom"
                                     className="mx-auto h-32 object-contain mb-4 rounded border"
                                 />
@@ -0,0 +1,10 @@
+const API_URL = 'http://localhost:8000';
+
+// An image under /input or /output, resized to `width` pixels (original size if omitted)
+// and served as WebP from the backend's thumbnail cache
+export const imageUrl = (path, width) =>
+    `${API_URL}/api/images/${path}${width ? `?w=${width}` : ''}`;
+
+// Sources for an image displayed `width` CSS pixels wide on normal and high-DPI screens
+export const imageSrcSet = (path, width) =>
+    `${imageUrl(path, width)} 1x, ${imageUrl(path, width * 2)} 2x`;
@@ -1,30 +1,66 @@
 import React, { useEffect, useState } from 'react';
 import { useNavigate } from 'react-router-dom';
 import axios from 'axios';
-import { ArrowLeftIcon, TrashIcon } from '@heroicons/react/24/outline';
+import { ArrowLeftIcon, MagnifyingGlassIcon, TrashIcon } from '@heroicons/react/24/outline';
 import ConfirmationModal from '../components/ConfirmationModal';
+import { imageSrcSet, imageUrl } from '../images';
 
 const HistoryPage = () => {
     const navigate = useNavigate();
     const [scans, setScans] = useState([]);
     const [loading, setLoading] = useState(true);
+    const [nextCursor, setNextCursor] = useState(null);
+    const [loadingMore, setLoadingMore] = useState(false);
     const [deleteModal, setDeleteModal] = useState({ isOpen: false, scanId: null });
+    const [query, setQuery] = useState('');
+    // Search results replace the history while a query is typed
+    const [results, setResults] = useState(null);
 
     useEffect(() => {
         fetchHistory();
     }, []);
 
-    const fetchHistory = async () => {
+    useEffect(() => {
+        if (!query.trim()) {
+            setResults(null);
+            return;
+        }
+        // Typing restarts the timer; answers to outdated queries are dropped
+        let stale = false;
+        const timer = setTimeout(async () => {
+            try {
+                const response = await axios.get('http://localhost:8000/api/search', { params: { q: query } });
+                if (!stale) setResults(response.data);
+            } catch (error) {
+                console.error("Search failed", error);
+            }
+        }, 250);
+        return () => {
+            stale = true;
+            clearTimeout(timer);
+        };
+    }, [query]);
+
+    const fetchHistory = async (cursor = null) => {
         try {
-            const response = await axios.get('http://localhost:8000/api/scans');
-            setScans(response.data);
+            const response = await axios.get('http://localhost:8000/api/scans', {
+                params: cursor ? { cursor } : {}
+            });
+            setScans(previous => cursor ? [...previous, ...response.data.items] : response.data.items);
+            setNextCursor(response.data.next_cursor);
         } catch (error) {
             console.error("Failed to fetch history", error);
         } finally {
             setLoading(false);
+            setLoadingMore(false);
         }
     };
 
+    const handleLoadMore = () => {
+        setLoadingMore(true);
+        fetchHistory(nextCursor);
+    };
+
     const handleDeleteClick = (e, id) => {
         e.stopPropagation();
         setDeleteModal({ isOpen: true, scanId: id });
@@ -35,12 +71,16 @@ const HistoryPage = () => {
         try {
             await axios.delete(`http://localhost:8000/api/scans/${deleteModal.scanId}`);
             setScans(scans.filter(s => s.id !== deleteModal.scanId));
+            if (results) setResults(results.filter(r => r.scan.id !== deleteModal.scanId));
         } catch (error) {
             console.error("Failed to delete", error);
             alert("Failed to delete scan");
         }
     };
 
+    const visibleScans = results ? results.map(r => r.scan) : scans;
+    const matchedFields = Object.fromEntries((results || []).map(r => [r.scan.id, r.fields]));
+
     return (
         <div className="max-w-6xl mx-auto py-8 px-4">
             <ConfirmationModal
@@ -59,11 +99,23 @@ const HistoryPage = () => {
                     <ArrowLeftIcon className="w-6 h-6" />
                 </button>
                 <h1 className="text-2xl font-bold text-slate-800">Scan History</h1>
+                <div className="ml-auto relative w-full max-w-xs">
+                    <MagnifyingGlassIcon className="w-5 h-5 text-slate-400 absolute left-3 top-1/2 -translate-y-1/2" />
+                    <input
+                        type="search"
+                        value={query}
+                        onChange={(e) => setQuery(e.target.value)}
+                        placeholder="Search name or number"
+                        className="w-full pl-10 pr-3 py-2 rounded-lg border border-slate-200 text-sm focus:outline-none focus:ring-2 focus:ring-indigo-500"
+                    />
+                </div>
             </div>
 
             {loading ? (
                 <div className="text-center py-20 text-slate-400">Loading history...</div>
-            ) : scans.length === 0 ? (
+            ) : results && results.length === 0 ? (
+                <div className="text-center py-20 text-slate-500">No scans match "{query}"</div>
+            ) : visibleScans.length === 0 ? (
                 <div className="text-center py-20 bg-slate-50 rounded-2xl border border-dotted border-slate-300">
                     <p className="text-slate-500 mb-4">No scans found</p>
                     <button onClick={() => navigate('/')} className="text-indigo-600 font-medium hover:underline">
@@ -72,7 +124,7 @@ const HistoryPage = () => {
                 </div>
             ) : (
                 <div className="grid grid-cols-1 md:grid-cols-2 lg:grid-cols-3 gap-6">
-                    {scans.map((scan) => (
+                    {visibleScans.map((scan) => (
                         <div
                             key={scan.id}
                             onClick={() => navigate(`/scan/${scan.id}`)}
@@ -81,7 +133,10 @@ const HistoryPage = () => {
                             <div className="aspect-video bg-slate-100 relative">
                                 {scan.card_image_path ? (
                                     <img
-                                        src={`http://localhost:8000/${scan.card_image_path}`}
+                                        src={imageUrl(scan.card_image_path, 320)}
+                                        srcSet={imageSrcSet(scan.card_image_path, 320)}
+                                        loading="lazy"
+                                        decoding="async"
                                         className="w-full h-full object-cover"
                                         alt="Scan thumbnail"
                                     />
@@ -110,12 +165,38 @@ const HistoryPage = () => {
                                 </div>
                                 <p className="text-xs text-slate-500">
                                     {new Date(scan.created_at).toLocaleString()}
+                                    {scan.status === 'completed' && ` · ${scan.field_count} fields`}
                                 </p>
+                                {matchedFields[scan.id] && (
+                                    <ul className="mt-2 space-y-1 text-sm text-slate-700">
+                                        {matchedFields[scan.id].map((field) => (
+                                            <li key={field.id} className="truncate">
+                                                {field.spans.map((span, i) => span.match ? (
+                                                    <mark key={i} className="bg-yellow-200 rounded px-0.5">{span.text}</mark>
+                                                ) : (
+                                                    <span key={i}>{span.text}</span>
+                                                ))}
+                                            </li>
+                                        ))}
+                                    </ul>
+                                )}
                             </div>
                         </div>
                     ))}
                 </div>
             )}
+
+            {nextCursor && !results && (
+                <div className="mt-8 text-center">
+                    <button
+                        onClick={handleLoadMore}
+                        disabled={loadingMore}
+                        className="px-4 py-2 text-indigo-600 font-medium rounded-lg hover:bg-indigo-50 disabled:opacity-50"
+                    >
+                        {loadingMore ? 'Loading...' : 'Load more'}
+                    </button>
+                </div>
+            )}
         </div>
     );
 };
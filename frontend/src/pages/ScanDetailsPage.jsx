@@ -1,4 +1,4 @@
-import React, { useEffect, useState, useRef } from 'react';
+import React, { useEffect, useState } from 'react';
 import { useParams, useNavigate } from 'react-router-dom';
 import axios from 'axios';
 import ScanViewer from '../components/ScanViewer';
@@ -9,46 +9,34 @@ const ScanDetailsPage = () => {
     const navigate = useNavigate();
     const [scan, setScan] = useState(null);
     const [progress, setProgress] = useState({ status: 'loading', percent: 0 });
-    const pollInterval = useRef(null);
 
     const fetchScan = async () => {
         try {
             const response = await axios.get(`http://localhost:8000/api/scans/${id}`);
             setScan(response.data);
-
-            if (response.data.status === 'completed' || response.data.status === 'failed') {
-                clearInterval(pollInterval.current);
-                setProgress({ status: response.data.status, percent: 100 });
-            }
         } catch (error) {
             console.error("Failed to fetch scan", error);
         }
     };
 
-    const fetchProgress = async () => {
-        try {
-            const response = await axios.get(`http://localhost:8000/api/scan/${id}/progress`);
-            setProgress(response.data);
-            if (response.data.status === 'completed' || response.data.status === 'failed') {
-                fetchScan(); // Get final data
-            }
-        } catch (error) {
-            console.error("Failed to fetch progress", error);
-        }
-    };
-
     useEffect(() => {
         fetchScan();
-        // Start polling
-        pollInterval.current = setInterval(() => {
-            fetchScan(); // Check DB status
-            // Also check progress memory ?? 
-            // Our backend updates DB status at the end. 
-            // But progress endpoint reads from memory tracker.
-            fetchProgress();
-        }, 1000);
 
-        return () => clearInterval(pollInterval.current);
+        // Progress is pushed by the server; the stream ends when the scan is done
+        const events = new EventSource(`http://localhost:8000/api/scans/${id}/events`);
+        events.onmessage = (event) => {
+            const update = JSON.parse(event.data);
+            setProgress(update);
+            if (['completed', 'failed', 'unknown'].includes(update.status)) {
+                events.close();
+                fetchScan(); // Get final data
+            }
+        };
+        events.onerror = (error) => {
+            console.error("Progress stream error", error);
+        };
+
+        return () => events.close();
     }, [id]);
 
     if (!scan) return <div className="p-10 text-center text-slate-500">Loading scan details...</div>;
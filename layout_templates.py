@@ -0,0 +1,171 @@
+import os
+import json
+import sys
+
+import cv2
+import numpy as np
+
+TEMPLATE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'templates')
+
+
+class LayoutTemplate:
+    """Fixed card layout with field rectangles in normalized card coordinates.
+
+    Rectangles are ``[x, y, width, height]`` as fractions of the card size, so a
+    template applies to any warped card regardless of its pixel resolution.
+    """
+
+    def __init__(self, name, fields, canonical_size=(1000, 630), min_confidence=0.75,
+                 min_ink=0.02, max_ink=0.6, description=''):
+        """
+        Args:
+            fields: List of ``{'name': str, 'rect': [x, y, w, h]}`` dicts.
+            canonical_size: (width, height) larger cards are shrunk to for scoring.
+            min_confidence: Fraction of fields that must look like text for the
+                template to be trusted.
+            min_ink, max_ink: Range of dark-pixel ratio expected inside a field.
+        """
+        self.name = name
+        self.fields = fields
+        self.canonical_size = tuple(canonical_size)
+        self.min_confidence = min_confidence
+        self.min_ink = min_ink
+        self.max_ink = max_ink
+        self.description = description
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(
+            name=data['name'],
+            fields=data['fields'],
+            canonical_size=data.get('canonical_size', (1000, 630)),
+            min_confidence=data.get('min_confidence', 0.75),
+            min_ink=data.get('min_ink', 0.02),
+            max_ink=data.get('max_ink', 0.6),
+            description=data.get('description', ''),
+        )
+
+    def to_dict(self):
+        return {
+            'name': self.name,
+            'description': self.description,
+            'canonical_size': list(self.canonical_size),
+            'min_confidence': self.min_confidence,
+            'min_ink': self.min_ink,
+            'max_ink': self.max_ink,
+            'fields': self.fields,
+        }
+
+    @classmethod
+    def from_fields(cls, name, field_info, card_width, card_height, **kwargs):
+        """Build a template from fields found by contour discovery on a reference card."""
+        fields = []
+        for i, field in enumerate(sorted(field_info, key=lambda f: (f['y'], f['x'])), 1):
+            fields.append({
+                'name': f'field_{i}',
+                'rect': [
+                    round(field['x'] / card_width, 4),
+                    round(field['y'] / card_height, 4),
+                    round(field['width'] / card_width, 4),
+                    round(field['height'] / card_height, 4),
+                ],
+            })
+        return cls(name, fields, **kwargs)
+
+    def boxes(self, width, height):
+        """Field rectangles in pixels for a card of the given size."""
+        boxes = []
+        for field in self.fields:
+            fx, fy, fw, fh = field['rect']
+            x, y = int(round(fx * width)), int(round(fy * height))
+            w, h = int(round(fw * width)), int(round(fh * height))
+            boxes.append((field['name'], x, y, w, h))
+        return boxes
+
+    def alignment_confidence(self, card_image):
+        """Fraction of template fields whose ink coverage looks like text.
+
+        Cards larger than ``canonical_size`` are shrunk to it, smaller ones
+        are scored as they are, then Otsu-thresholded; a misaligned template
+        lands on blank card or on photos/logos, which fall outside the
+        ``[min_ink, max_ink]`` range.
+        """
+        height, width = card_image.shape[:2]
+        if width > self.canonical_size[0]:
+            card_image = cv2.resize(card_image, self.canonical_size, interpolation=cv2.INTER_AREA)
+            width, height = self.canonical_size
+        gray = cv2.cvtColor(card_image, cv2.COLOR_BGR2GRAY)
+        _, thresh = cv2.threshold(gray, 0, 255, cv2.THRESH_BINARY_INV + cv2.THRESH_OTSU)
+
+        if not self.fields:
+            return 0.0
+        matched = 0
+        for _, x, y, w, h in self.boxes(width, height):
+            region = thresh[y:y + h, x:x + w]
+            if region.size == 0:
+                continue
+            ink = np.count_nonzero(region) / region.size
+            if self.min_ink <= ink <= self.max_ink:
+                matched += 1
+        return matched / len(self.fields)
+
+    def save(self, path):
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(self.to_dict(), f, indent=2)
+
+
+def load_templates(directory=TEMPLATE_DIR):
+    """Load every ``*.json`` layout template in a directory, keyed by name."""
+    templates = {}
+    if not os.path.isdir(directory):
+        return templates
+    for filename in sorted(os.listdir(directory)):
+        if filename.endswith('.json'):
+            with open(os.path.join(directory, filename), encoding='utf-8') as f:
+                template = LayoutTemplate.from_dict(json.load(f))
+            templates[template.name] = template
+    return templates
+
+
+_registry = None
+
+
+def get_template(name):
+    """Look up a template from the bundled ``templates/`` registry by name."""
+    global _registry
+    if _registry is None:
+        _registry = load_templates()
+    if name not in _registry:
+        raise KeyError(f"Unknown layout template '{name}', available: {sorted(_registry)}")
+    return _registry[name]
+
+
+def main():
+    """Calibrate a template from a reference photo: layout_templates.py IMAGE NAME"""
+    if len(sys.argv) != 3:
+        print("Usage: python layout_templates.py REFERENCE_IMAGE TEMPLATE_NAME")
+        sys.exit(1)
+    image_path, name = sys.argv[1:]
+
+    from card_detection import CardDetector
+    from field_filter import FieldExtractor
+
+    result = CardDetector().detect_card(image_path)
+    if not result['success']:
+        print("❌ Failed to detect card")
+        sys.exit(1)
+
+    card_image = result['card_image']
+    fields = FieldExtractor(save_crops=False).find_text_boxes(card_image)
+    field_info = [{'x': x, 'y': y, 'width': w, 'height': h} for x, y, w, h in fields]
+    height, width = card_image.shape[:2]
+    template = LayoutTemplate.from_fields(name, field_info, width, height)
+
+    os.makedirs(TEMPLATE_DIR, exist_ok=True)
+    path = os.path.join(TEMPLATE_DIR, f'{name}.json')
+    template.save(path)
+    print(f"✓ Saved template with {len(template.fields)} fields to '{path}'")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,13 +1,29 @@
+import argparse
+import csv
+import glob
+import json
 import os
-import cv2
+import sys
+import time
 import pytesseract
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
 from pathlib import Path
 from dotenv import load_dotenv
 
-from card_detection import CardDetector
+from artifact_writer import ArtifactWriter
+from card_detection import WORKING_WIDTH, CardDetector
+from debug_sink import make_debug_sink
 from field_filter import FieldExtractor
+from pipeline_hooks import HookList, ImageSummary, ProgressHooks
+from pipeline_logging import LOG_MODES, current_settings, get_logger, setup_logging
 from text_extraction import TextExtractor
 
+# Bump when a pipeline change alters results, so cached results are not reused
+PIPELINE_VERSION = "2"
+
+logger = get_logger(__name__)
+
 # Load environment variables
 load_dotenv()
 
@@ -20,119 +36,570 @@ if tesseract_path:
 class IDCardProcessor:
     """Main pipeline for processing ID cards."""
     
-    def __init__(self, debug_mode=False):
-        self.detector = CardDetector(debug_mode=debug_mode)
-        self.field_extractor = FieldExtractor(debug_mode=debug_mode)
-        self.text_extractor = TextExtractor(x_threshold=200, debug_mode=debug_mode)
+    def __init__(self, debug_mode=False, save_crops=True, async_writes=True, batch_ocr=False,
+                 detection_long_edge=None, orientation_thumbnail=None, layout_template=None,
+                 save_annotated=False, debug_dir=None, save_card=True, save_text=True,
+                 canny_thresholds=(30, 200), dilation_kernel=(20, 4), x_threshold=200,
+                 ocr_lang='tur', ocr_psm=7, card_width=WORKING_WIDTH, hooks=None,
+                 debug_sink=None):
+        """
+        Args:
+            debug_mode: Show intermediate visualizations in windows, waiting
+                for a key press after each (interactive use only).
+            save_crops: Persist field crops to disk. OCR always runs on the
+                in-memory crops, so this is only needed for inspection/serving.
+            async_writes: Write image artifacts on background threads instead
+                of blocking the pipeline; call ``flush()`` before reading them.
+            batch_ocr: Recognize all fields of a card with a single OCR call.
+            detection_long_edge: Find the card outline on a copy downscaled to
+                this long edge (e.g. 1280) instead of the full photo.
+            orientation_thumbnail: Score text orientation on a thumbnail with
+                this long edge (e.g. 400) instead of the full warped card.
+            layout_template: Name of a layout in ``templates/`` to crop fields
+                from directly; contour discovery is used when it does not fit.
+            save_annotated: Also write ``{name}_annotated.jpg`` with the
+                field boxes drawn on the card.
+            debug_dir: Dump every intermediate image of each photo under
+                ``debug_dir/{name}/`` instead of showing windows (headless).
+            save_card: Write the straightened ``{name}_detected_card.jpg``.
+            save_text: Write the texts to ``{name}_ocr_results.txt``.
+            canny_thresholds: Edge thresholds for finding the card outline.
+            card_width: Canonical working width the card is warped to (None
+                keeps its size in the photo). With a working width the pixel
+                sizes below are given for a ``WORKING_WIDTH`` card and scaled
+                to the actual width; without one they are used as given.
+            dilation_kernel: (width, height) joining characters into fields.
+            x_threshold: Fields starting left of this x (photo side) are not OCR'd.
+            ocr_lang, ocr_psm: Tesseract language and page segmentation mode.
+            hooks: ``PipelineHooks`` notified of every image's stage timings.
+                Not part of ``config``, so worker processes don't inherit them.
+            debug_sink: Any ``DebugSink`` (e.g. a ``MemorySink``) overriding
+                ``debug_mode`` and ``debug_dir``; not inherited by workers either.
+        """
+        # Kept so worker processes can build an identically configured pipeline
+        self.config = {
+            'debug_mode': debug_mode,
+            'save_crops': save_crops,
+            'async_writes': async_writes,
+            'batch_ocr': batch_ocr,
+            'detection_long_edge': detection_long_edge,
+            'orientation_thumbnail': orientation_thumbnail,
+            'layout_template': layout_template,
+            'save_annotated': save_annotated,
+            'debug_dir': debug_dir,
+            'save_card': save_card,
+            'save_text': save_text,
+            'canny_thresholds': tuple(canny_thresholds),
+            'dilation_kernel': tuple(dilation_kernel),
+            'x_threshold': x_threshold,
+            'ocr_lang': ocr_lang,
+            'ocr_psm': ocr_psm,
+            'card_width': card_width,
+        }
+        self.save_card = save_card
+        self.hooks = list(hooks or [])
+        self.debug = debug_sink or make_debug_sink(debug_mode, debug_dir)
+        self.writer = ArtifactWriter(async_writes=async_writes)
+        self.detector = CardDetector(
+            detection_long_edge=detection_long_edge,
+            orientation_thumbnail=orientation_thumbnail,
+            debug_sink=self.debug,
+            canny_thresholds=canny_thresholds,
+            card_width=card_width,
+        )
+        reference_width = WORKING_WIDTH if card_width else None
+        self.field_extractor = FieldExtractor(
+            save_crops=save_crops, writer=self.writer, template=layout_template,
+            save_annotated=save_annotated, debug_sink=self.debug,
+            dilation_kernel=dilation_kernel, reference_width=reference_width
+        )
+        self.text_extractor = TextExtractor(
+            x_threshold=x_threshold, lang=ocr_lang, psm=ocr_psm, batch_ocr=batch_ocr,
+            debug_sink=self.debug, save_results=save_text, reference_width=reference_width
+        )
+    
+    def flush(self):
+        """Wait until all queued artifact writes are on disk."""
+        self.writer.flush()
     
-    def process_image(self, image_path, output_dir='output'):
-        """Process a single ID card image through the entire pipeline."""
-        print(f"\n{'='*70}")
-        print(f"📷 Processing: {image_path}")
-        print('='*70)
+    def close(self):
+        """Flush pending artifact writes and release writer threads."""
+        self.writer.close()
+    
+    def process_image(self, image_path, output_dir='output', progress_callback=None, hooks=None,
+                      image=None):
+        """Process a single ID card image through the entire pipeline.
+        
+        ``hooks`` (added to the processor's own) are told when detection,
+        field extraction, OCR and each OCR call start and finish.
+        ``progress_callback(stage, percent)`` is called as each stage starts
+        and after every OCR'd field. One ``image_summary`` record with the
+        image's timings and counts is logged when it is done. An already
+        decoded BGR ``image`` is used instead of reading ``image_path``,
+        which then only names the outputs.
+        """
+        summary = ImageSummary(image_path)
+        hook_list = HookList(self.hooks + list(hooks or []) + [summary])
+        if progress_callback is not None:
+            hook_list.hooks.append(ProgressHooks(progress_callback))
+        
+        error = None
+        self.debug.begin(Path(image_path).stem)
+        try:
+            result = self._run_stages(image_path, output_dir, hook_list, image)
+            if result is None:
+                error = "Card detection failed"
+            return result
+        except Exception as e:
+            error = f"{type(e).__name__}: {e}"
+            raise
+        finally:
+            self.debug.end()
+            self._log_summary(summary.finish(error is None, error))
+    
+    @staticmethod
+    def _log_summary(record):
+        data = {'event': 'image_summary', **record}
+        name = os.path.basename(record['image_path'])
+        if record['success']:
+            logger.info("✅ %s: %s fields, %s texts in %.2fs", name, record.get('fields'),
+                        record.get('texts'), record['elapsed'], extra={'data': data})
+        else:
+            logger.warning("❌ %s: %s after %.2fs", name, record['error'], record['elapsed'],
+                           extra={'data': data})
+    
+    def _run_stages(self, image_path, output_dir, hook_list, image=None):
+        """Detection, field extraction and OCR of one image; None if no card is found."""
+        logger.debug('='*70)
+        logger.info("📷 Processing: %s", image_path)
+        logger.debug('='*70)
         
         # Get base name for output files
         base_name = Path(image_path).stem
         
         # Step 1: Detect and extract card
-        print("\n[Step 1/3] Card Detection")
-        print('-'*70)
-        result = self.detector.detect_card(image_path)
+        logger.debug("[Step 1/3] Card Detection")
+        logger.debug('-'*70)
+        with hook_list.stage('detection', image_path=image_path) as info:
+            if image is not None:
+                result = self.detector.detect_card_in_image(image)
+            else:
+                result = self.detector.detect_card(image_path)
+            info['success'] = result['success']
+            info['fallback'] = result.get('fallback', False)
+            if 'image_size' in result:
+                info['width'], info['height'] = result['image_size']
+            if result['success']:
+                info['card_height'], info['card_width'] = result['card_image'].shape[:2]
         
         if not result['success']:
-            print("❌ Failed to detect card")
             return None
         
         # Save detected card
         os.makedirs(output_dir, exist_ok=True)
-        card_path = os.path.join(output_dir, f'{base_name}_detected_card.jpg')
-        cv2.imwrite(card_path, result['card_image'])
-        print(f"✓ Saved detected card to: {card_path}")
+        if self.save_card:
+            card_path = os.path.join(output_dir, f'{base_name}_detected_card.jpg')
+            self.writer.write(card_path, result['card_image'])
+            logger.info("✓ Saved detected card to: %s", card_path)
         
         # Step 2: Extract fields
-        print("\n[Step 2/3] Field Extraction")
-        print('-'*70)
-        field_info = self.field_extractor.extract_fields(
-            result['card_image'], base_name, output_dir
-        )
+        logger.debug("[Step 2/3] Field Extraction")
+        logger.debug('-'*70)
+        card_height, card_width = result['card_image'].shape[:2]
+        with hook_list.stage('field_extraction', image_path=image_path,
+                             width=card_width, height=card_height) as info:
+            field_info = self.field_extractor.extract_fields(
+                result['card_image'], base_name, output_dir
+            )
+            info['fields'] = len(field_info)
+            info['template'] = self.field_extractor.used_template
         
         # Step 3: Extract text
-        print("\n[Step 3/3] Text Extraction (OCR)")
-        print('-'*70)
-        extracted_texts = self.text_extractor.extract_text(
-            field_info, base_name, output_dir
-        )
+        logger.debug("[Step 3/3] Text Extraction (OCR)")
+        logger.debug('-'*70)
+        with hook_list.stage('ocr', image_path=image_path, fields=len(field_info)) as info:
+            extracted_texts = self.text_extractor.extract_text(
+                field_info, base_name, output_dir, hooks=hook_list, card_width=card_width
+            )
+            info['texts'] = len(extracted_texts)
+            info['ocr_calls'] = hook_list.counts['ocr_call']
+            ocr_error = self.text_extractor.last_error
+        
+        # Recognized fields with their position, for callers that store them
+        fields = [
+            {key: field[key] for key in ('text', 'x', 'y', 'width', 'height', 'path')}
+            for field in field_info if field.get('text')
+        ]
         
-        print(f"\n{'='*70}")
-        print("✅ SUCCESS! Processing complete")
-        print('='*70)
+        # Everything written to output_dir for this image (crops as one directory)
+        artifacts = []
+        if self.save_card:
+            artifacts.append(card_path)
+        if self.config['save_annotated']:
+            artifacts.append(os.path.join(output_dir, f'{base_name}_annotated.jpg'))
+        if self.config['save_crops'] and field_info:
+            artifacts.append(os.path.join(output_dir, f'{base_name}_fields'))
+        if self.config['save_text']:
+            artifacts.append(os.path.join(output_dir, f'{base_name}_ocr_results.txt'))
         
         return {
             'image_path': image_path,
             'base_name': base_name,
             'card_image': result['card_image'],
-            'extracted_texts': extracted_texts
+            'contour': result['contour'],
+            'extracted_texts': extracted_texts,
+            'fields': fields,
+            'artifacts': artifacts,
+            'ocr_error': ocr_error,
         }
     
-    def process_directory(self, input_dir='input_images', output_dir='output'):
-        """Process all images in a directory."""
-        print("="*70)
-        print("ID CARD PROCESSING PIPELINE")
-        print("="*70)
+    def _process_one(self, image_path, output_dir, keep_images=False):
+        """Process one image into a result record; never raises.
+        
+        The record always has ``success`` and ``error`` keys. The full
+        resolution ``card_image`` is only kept when ``keep_images`` is set.
+        """
+        record = {
+            'image_path': image_path,
+            'base_name': Path(image_path).stem,
+            'success': False,
+            'error': None,
+            'extracted_texts': [],
+        }
+        try:
+            result = self.process_image(image_path, output_dir)
+        except Exception as e:
+            logger.error("❌ Error processing %s: %s", image_path, e)
+            record['error'] = f"{type(e).__name__}: {e}"
+            return record
+        
+        if result is None:
+            record['error'] = "Card detection failed"
+            return record
+        
+        record.update(result)
+        record['success'] = True
+        if not keep_images:
+            record.pop('card_image', None)
+        return record
+    
+    def iter_process(self, image_paths, output_dir='output', workers=1, ordered=True,
+                     keep_images=False):
+        """Process images lazily, yielding one result record per image.
+        
+        ``image_paths`` can be any iterable (a list, ``scan_images(...)``, lines
+        read from stdin, ...); it is consumed incrementally, and with a worker
+        pool at most ``2 * workers`` images are in flight, so memory stays
+        constant regardless of batch size. With ``ordered=False`` records are
+        yielded as soon as they finish instead of in input order.
+        
+        Artifacts may still be queued for writing when a record is yielded in
+        the sequential mode, at most ``ArtifactWriter.max_pending`` of them;
+        they are flushed when the generator finishes.
+        """
+        if workers <= 1:
+            try:
+                for i, image_path in enumerate(image_paths, 1):
+                    logger.debug("[Image %d]", i)
+                    yield self._process_one(image_path, output_dir, keep_images)
+            finally:
+                self.flush()
+            return
+        
+        executor = ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                       initargs=(self.config, current_settings()))
+        max_pending = 2 * workers
+        pending = deque()
+        try:
+            for image_path in image_paths:
+                pending.append(executor.submit(_process_in_worker, image_path, output_dir, keep_images))
+                while len(pending) >= max_pending:
+                    yield from self._drain(pending, ordered)
+            while pending:
+                yield from self._drain(pending, ordered)
+        finally:
+            executor.shutdown(wait=True, cancel_futures=True)
+    
+    @staticmethod
+    def _drain(pending, ordered):
+        """Yield the next finished record(s) from a deque of futures."""
+        if ordered:
+            yield pending.popleft().result()
+            return
+        done, _ = wait(pending, return_when=FIRST_COMPLETED)
+        for future in done:
+            pending.remove(future)
+            yield future.result()
+    
+    def process_directory(self, input_dir='input_images', output_dir='output', workers=1):
+        """Process all images in a directory.
+        
+        With ``workers > 1`` images are distributed over a process pool, each
+        worker owning its own pipeline. Results keep the directory order and a
+        failing image never aborts the rest of the batch.
+        """
+        logger.debug("="*70)
+        logger.info("ID CARD PROCESSING PIPELINE")
+        logger.debug("="*70)
         
         # Find all image files
-        image_extensions = ('.jpg', '.jpeg', '.png', '.bmp')
-        image_files = [
-            f for f in os.listdir(input_dir)
-            if f.lower().endswith(image_extensions) and os.path.isfile(os.path.join(input_dir, f))
-        ]
+        image_paths = sorted(scan_images(input_dir, recursive=False))
         
-        if not image_files:
-            print(f"❌ No images found in '{input_dir}'")
+        if not image_paths:
+            logger.error("❌ No images found in '%s'", input_dir)
             return []
         
-        print(f"\n✓ Found {len(image_files)} images to process")
+        logger.info("✓ Found %d images to process", len(image_paths))
+        if workers > 1:
+            logger.info("✓ Using %d worker processes", workers)
         
-        results = []
-        for i, image_file in enumerate(image_files, 1):
-            image_path = os.path.join(input_dir, image_file)
-            print(f"\n\n[Image {i}/{len(image_files)}]")
-            
-            result = self.process_image(image_path, output_dir)
-            if result:
-                results.append(result)
+        start_time = time.perf_counter()
+        records = list(self.iter_process(image_paths, output_dir, workers=workers, keep_images=True))
+        elapsed = time.perf_counter() - start_time
+        
+        results = [record for record in records if record['success']]
+        errors = [record for record in records if not record['success']]
         
         # Print summary
-        print("\n\n" + "="*70)
-        print("PROCESSING SUMMARY")
-        print("="*70)
-        print(f"Total images processed: {len(image_files)}")
-        print(f"Successful: {len(results)}")
-        print(f"Failed: {len(image_files) - len(results)}")
+        log_batch_summary(len(image_paths), len(results), elapsed)
+        
+        for record in errors:
+            logger.info("  ❌ %s: %s", os.path.basename(record['image_path']), record['error'])
         
         for result in results:
-            print(f"\n{result['base_name']}:")
+            logger.info("%s:", result['base_name'])
             for text in result['extracted_texts']:
-                print(f"  - {text}")
+                logger.info("  - %s", text)
         
         return results
 
 
-def main():
-    """Main entry point."""
-    # Configuration
-    INPUT_DIR = 'input_images'
-    OUTPUT_DIR = 'output'
-    DEBUG_MODE = True  # Set to True to see intermediate visualizations with key waits
+def log_batch_summary(total, successful, elapsed):
+    """Log one ``batch_summary`` record for a finished batch."""
+    logger.debug("="*70)
+    logger.info("PROCESSING SUMMARY: %d images, %d successful, %d failed in %.2fs "
+                "(%.2f images/sec)", total, successful, total - successful, elapsed,
+                total / elapsed if elapsed else 0.0, extra={'data': {
+                    'event': 'batch_summary', 'images': total, 'successful': successful,
+                    'failed': total - successful, 'elapsed': elapsed,
+                }})
+    logger.debug("="*70)
+
+
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.bmp')
+
+
+def scan_images(input_dir, recursive=True):
+    """Lazily yield image paths under ``input_dir`` without listing it up front."""
+    stack = [input_dir]
+    while stack:
+        directory = stack.pop()
+        with os.scandir(directory) as entries:
+            for entry in entries:
+                if entry.is_dir(follow_symlinks=False):
+                    if recursive:
+                        stack.append(entry.path)
+                elif entry.is_file() and entry.name.lower().endswith(IMAGE_EXTENSIONS):
+                    yield entry.path
+
+
+# Per-process pipeline used by the worker pool
+_worker_processor = None
+
+
+def _init_worker(config, log_settings=None):
+    """Build the worker's own pipeline once, when the worker process starts."""
+    global _worker_processor
+    if log_settings:
+        setup_logging(**log_settings)
+    _worker_processor = IDCardProcessor(**config)
+
+
+def _process_in_worker(image_path, output_dir, keep_images):
+    """Process one image in a pool worker and return its result record."""
+    record = _worker_processor._process_one(image_path, output_dir, keep_images)
+    _worker_processor.flush()
+    return record
+
+
+def iter_inputs(inputs, recursive=False):
+    """Expand files, directories and glob patterns into image paths, lazily."""
+    for item in inputs:
+        if os.path.isdir(item):
+            yield from sorted(scan_images(item, recursive=recursive))
+        elif glob.has_magic(item):
+            for path in sorted(glob.iglob(item, recursive=True)):
+                if os.path.isfile(path) and path.lower().endswith(IMAGE_EXTENSIONS):
+                    yield path
+        else:
+            yield item
+
+
+def read_file_list(path):
+    """Image paths listed one per line in ``path`` ('-' for stdin)."""
+    stream = sys.stdin if path == '-' else open(path, encoding='utf-8')
+    try:
+        for line in stream:
+            line = line.strip()
+            if line and not line.startswith('#'):
+                yield line
+    finally:
+        if stream is not sys.stdin:
+            stream.close()
+
+
+RESULT_FORMATS = ('jsonl', 'csv')
+ARTIFACTS = ('card', 'annotated', 'crops', 'text')
+
+
+class ResultWriter:
+    """Writes one result row per processed image as JSON lines or CSV."""
+
+    CSV_COLUMNS = ('image_path', 'base_name', 'success', 'error', 'texts')
+
+    def __init__(self, stream, fmt='jsonl'):
+        self.stream = stream
+        self.fmt = fmt
+        self._csv = None
+        if fmt == 'csv':
+            self._csv = csv.writer(stream)
+            self._csv.writerow(self.CSV_COLUMNS)
+
+    def write(self, record):
+        row = {
+            'image_path': record['image_path'],
+            'base_name': record['base_name'],
+            'success': record['success'],
+            'error': record['error'],
+            'texts': record['extracted_texts'],
+        }
+        if self._csv is not None:
+            row['texts'] = ' | '.join(row['texts'])
+            self._csv.writerow([row[column] for column in self.CSV_COLUMNS])
+        else:
+            self.stream.write(json.dumps(row, ensure_ascii=False) + '\n')
+        self.stream.flush()
+
+
+def _pair(value):
+    """Parse 'A,B' or 'AxB' into a tuple of two ints."""
+    try:
+        first, second = value.lower().replace('x', ',').split(',')
+        return int(first), int(second)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"expected two integers like 20,4 (got '{value}')")
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(
+        description="Detect student cards in photos and read their text fields.",
+    )
+    parser.add_argument('inputs', nargs='*',
+                        help="image files, directories or glob patterns (default: input_images)")
+    parser.add_argument('--files-from', metavar='FILE',
+                        help="read image paths one per line from FILE ('-' for stdin)")
+    parser.add_argument('-r', '--recursive', action='store_true',
+                        help='also search subdirectories of input directories')
+    parser.add_argument('-o', '--output-dir', default='output', help='directory for artifacts')
+    parser.add_argument('-w', '--workers', type=int, default=1, help='worker processes')
+    parser.add_argument('--unordered', action='store_true',
+                        help='emit results as they finish instead of in input order')
+
+    results = parser.add_argument_group('results')
+    results.add_argument('-f', '--format', choices=RESULT_FORMATS,
+                         help='write one result row per image in this format')
+    results.add_argument('--results', metavar='FILE',
+                         help='file for the result rows (default: stdout, logs go to stderr)')
+    results.add_argument('--artifacts', nargs='*', choices=ARTIFACTS, default=list(ARTIFACTS),
+                         help='artifacts to write to the output directory (none if empty)')
+    results.add_argument('--log', choices=LOG_MODES, default='text', help='log output')
+    results.add_argument('--debug-dir', help='dump intermediate images of every photo here')
+    results.add_argument('--debug', action='store_true',
+                         help='show intermediate images in windows (interactive, 1 worker)')
+
+    tuning = parser.add_argument_group('pipeline tuning')
+    tuning.add_argument('--card-width', type=int, default=WORKING_WIDTH,
+                        help=f'working width the card is warped to, 0 keeps its photo size '
+                             f'(default: {WORKING_WIDTH}); sizes below are for {WORKING_WIDTH}px')
+    tuning.add_argument('--canny', type=_pair, default=(30, 200), metavar='LOW,HIGH',
+                        help='Canny thresholds for the card outline (default: 30,200)')
+    tuning.add_argument('--kernel', type=_pair, default=(20, 4), metavar='W,H',
+                        help='dilation kernel joining characters into fields (default: 20,4)')
+    tuning.add_argument('--x-threshold', type=int, default=200,
+                        help='skip fields starting left of this x (default: 200)')
+    tuning.add_argument('--lang', default='tur', help='Tesseract language (default: tur)')
+    tuning.add_argument('--psm', type=int, default=7, help='Tesseract page segmentation mode')
+    tuning.add_argument('--batch-ocr', action='store_true', help='one OCR call per card')
+    tuning.add_argument('--long-edge', type=int, help='detect on a copy with this long edge')
+    tuning.add_argument('--orientation-thumbnail', type=int,
+                        help='score orientation on a thumbnail with this long edge')
+    tuning.add_argument('--template', help='layout template in templates/ to crop fields with')
+    return parser
+
+
+def main(argv=None):
+    """Command-line entry point for batch runs."""
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    if args.debug and args.workers > 1:
+        # Worker processes cannot share the interactive windows
+        parser.error('--debug needs a single worker; use --debug-dir with --workers')
+    
+    # Rows on stdout must not be interleaved with log lines
+    rows_on_stdout = args.format and not args.results
+    setup_logging(args.log, stream=sys.stderr if rows_on_stdout else None)
+    
+    if args.files_from:
+        image_paths = read_file_list(args.files_from)
+    else:
+        image_paths = iter_inputs(args.inputs or ['input_images'], recursive=args.recursive)
+    
+    processor = IDCardProcessor(
+        debug_mode=args.debug,
+        debug_dir=args.debug_dir,
+        save_card='card' in args.artifacts,
+        save_annotated='annotated' in args.artifacts,
+        save_crops='crops' in args.artifacts,
+        save_text='text' in args.artifacts,
+        canny_thresholds=args.canny,
+        card_width=args.card_width or None,
+        dilation_kernel=args.kernel,
+        x_threshold=args.x_threshold,
+        ocr_lang=args.lang,
+        ocr_psm=args.psm,
+        batch_ocr=args.batch_ocr,
+        detection_long_edge=args.long_edge,
+        orientation_thumbnail=args.orientation_thumbnail,
+        layout_template=args.template,
+    )
     
-    # Create processor
-    processor = IDCardProcessor(debug_mode=DEBUG_MODE)
+    results_file = None
+    writer = None
+    if args.format:
+        results_file = open(args.results, 'w', encoding='utf-8', newline='') if args.results else sys.stdout
+        writer = ResultWriter(results_file, args.format)
     
-    # Process all images in directory
-    processor.process_directory(INPUT_DIR, OUTPUT_DIR)
+    total = successful = 0
+    start_time = time.perf_counter()
+    try:
+        for record in processor.iter_process(image_paths, args.output_dir, workers=args.workers,
+                                             ordered=not args.unordered):
+            total += 1
+            successful += record['success']
+            if writer is not None:
+                writer.write(record)
+    finally:
+        processor.close()
+        if results_file is not None and results_file is not sys.stdout:
+            results_file.close()
     
-    print(f"\n✓ All results saved to '{OUTPUT_DIR}' directory")
+    if not total:
+        logger.error("❌ No images found")
+        return 1
+    log_batch_summary(total, successful, time.perf_counter() - start_time)
+    logger.info("✓ All results saved to '%s' directory", args.output_dir)
+    return 0
 
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    sys.exit(main())
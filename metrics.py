@@ -0,0 +1,170 @@
+import bisect
+import threading
+
+from pipeline_hooks import PipelineHooks
+from pipeline_logging import get_logger
+
+logger = get_logger(__name__)
+
+# Seconds; covers a fast template crop up to a slow full-resolution OCR pass
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+COUNT_BUCKETS = (0, 1, 2, 4, 6, 8, 12, 16, 24, 32)
+
+
+def _format_labels(labels):
+    if not labels:
+        return ''
+    pairs = ','.join(f'{name}="{value}"' for name, value in labels)
+    return '{' + pairs + '}'
+
+
+def _format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _Metric:
+    """Base for metrics rendered in the Prometheus text exposition format."""
+
+    kind = 'untyped'
+
+    def __init__(self, name, help_text, value_fn=None):
+        """
+        Args:
+            value_fn: Callable returning the (unlabeled) value at scrape time,
+                for values that are tracked elsewhere.
+        """
+        self.name = name
+        self.help_text = help_text
+        self.value_fn = value_fn
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def _samples(self):
+        if self.value_fn is not None:
+            return [(self.name, (), self.value_fn())]
+        with self._lock:
+            return [(self.name, labels, value) for labels, value in sorted(self._values.items())]
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.help_text}', f'# TYPE {self.name} {self.kind}']
+        for name, labels, value in self._samples():
+            lines.append(f'{name}{_format_labels(labels)} {_format_value(value)}')
+        return lines
+
+
+class Counter(_Metric):
+    kind = 'counter'
+
+    def inc(self, amount=1, **labels):
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+
+class Gauge(_Metric):
+    kind = 'gauge'
+
+    def set(self, value, **labels):
+        with self._lock:
+            self._values[tuple(sorted(labels.items()))] = value
+
+
+class Histogram(_Metric):
+    kind = 'histogram'
+
+    def __init__(self, name, help_text, buckets=LATENCY_BUCKETS):
+        super().__init__(name, help_text)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value, **labels):
+        key = tuple(sorted(labels.items()))
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            counts, total = self._values.get(key, ([0] * (len(self.buckets) + 1), 0.0))
+            counts[index] += 1
+            self._values[key] = (counts, total + value)
+
+    def _samples(self):
+        with self._lock:
+            values = sorted((labels, (list(counts), total))
+                            for labels, (counts, total) in self._values.items())
+        samples = []
+        for labels, (counts, total) in values:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float('inf'),), counts):
+                cumulative += count
+                samples.append((f'{self.name}_bucket', labels + (('le', _format_value(bound)),),
+                                cumulative))
+            samples.append((f'{self.name}_sum', labels, total))
+            samples.append((f'{self.name}_count', labels, cumulative))
+        return samples
+
+
+class MetricsRegistry:
+    """Named collection of metrics rendered together for a ``/metrics`` scrape."""
+
+    def __init__(self):
+        self._metrics = []
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def counter(self, name, help_text, value_fn=None):
+        return self.register(Counter(name, help_text, value_fn))
+
+    def gauge(self, name, help_text, value_fn=None):
+        return self.register(Gauge(name, help_text, value_fn))
+
+    def histogram(self, name, help_text, buckets=LATENCY_BUCKETS):
+        return self.register(Histogram(name, help_text, buckets))
+
+    def render(self):
+        """All metrics in the Prometheus text exposition format."""
+        lines = []
+        for metric in self._metrics:
+            try:
+                lines.extend(metric.render())
+            except Exception as e:
+                logger.warning("⚠ Could not collect metric %s: %s", metric.name, e)
+        return '\n'.join(lines) + '\n'
+
+
+class PipelineMetrics(PipelineHooks):
+    """Pipeline hooks that record stage latencies and per-card counts.
+
+    Every event is recorded from its own ``info``, so events of several
+    images may arrive interleaved (e.g. forwarded from worker processes).
+    """
+
+    def __init__(self, registry=None):
+        self.registry = registry or MetricsRegistry()
+        self.stage_seconds = self.registry.histogram(
+            'card_reader_stage_seconds', 'Wall time of each pipeline stage.')
+        self.detections = self.registry.counter(
+            'card_reader_detections_total',
+            'Card detections by method (contour, fallback) or failed.')
+        self.fields_per_card = self.registry.histogram(
+            'card_reader_fields_per_card', 'Text fields found on each card.', COUNT_BUCKETS)
+        self.ocr_calls_per_card = self.registry.histogram(
+            'card_reader_ocr_calls_per_card', 'OCR engine calls made for each card.', COUNT_BUCKETS)
+        self.stage_errors = self.registry.counter(
+            'card_reader_stage_errors_total', 'Pipeline stages that raised an exception.')
+
+    def stage_finished(self, stage, elapsed, info):
+        self.stage_seconds.observe(elapsed, stage=stage)
+        if 'error' in info:
+            self.stage_errors.inc(stage=stage)
+            return
+        if stage == 'detection':
+            if not info.get('success'):
+                method = 'failed'
+            else:
+                method = 'fallback' if info.get('fallback') else 'contour'
+            self.detections.inc(method=method)
+        elif stage == 'field_extraction':
+            self.fields_per_card.observe(info['fields'])
+        elif stage == 'ocr':
+            self.ocr_calls_per_card.observe(info['ocr_calls'])
@@ -0,0 +1,175 @@
+import os
+import queue
+import threading
+
+import cv2
+import pytesseract
+
+from pipeline_logging import get_logger
+
+try:
+    import tesserocr
+    from PIL import Image
+except ImportError:  # tesserocr is optional; pytesseract is always available
+    tesserocr = None
+
+logger = get_logger(__name__)
+
+
+class PytesseractEngine:
+    """OCR backend that runs the tesseract CLI through pytesseract.
+
+    Every call starts a new tesseract process, so this is the slow path and is
+    only used when no persistent backend is available.
+    """
+
+    name = 'pytesseract'
+
+    def __init__(self, lang='tur', psm=7):
+        self.lang = lang
+        self.psm = psm
+
+    def image_to_string(self, image):
+        """Recognize a single text line from a BGR or grayscale image."""
+        return pytesseract.image_to_string(image, lang=self.lang, config=f'--psm {self.psm}')
+
+    def image_to_words(self, image, psm=6):
+        """Recognize a multi-line image and return word-level boxes."""
+        data = pytesseract.image_to_data(image, lang=self.lang, config=f'--psm {psm}',
+                                         output_type=pytesseract.Output.DICT)
+        words = []
+        for i, text in enumerate(data['text']):
+            text = text.strip()
+            if not text:
+                continue
+            words.append({
+                'text': text,
+                'left': data['left'][i],
+                'top': data['top'][i],
+                'width': data['width'][i],
+                'height': data['height'][i],
+                'conf': float(data['conf'][i]),
+            })
+        return words
+
+    def close(self):
+        pass
+
+
+class TesserocrEngine:
+    """OCR backend that keeps tesseract API instances loaded via tesserocr.
+
+    The traineddata is loaded once per instance and the instances are reused
+    for every field of every card, so no process is spawned per call.
+    ``pool_size`` instances are kept to serve concurrent threads.
+    """
+
+    name = 'tesserocr'
+
+    def __init__(self, lang='tur', psm=7, pool_size=1, tessdata_path=None):
+        if tesserocr is None:
+            raise ImportError("tesserocr is not installed")
+
+        self.lang = lang
+        self.psm = psm
+        self.tessdata_path = tessdata_path or os.getenv('TESSDATA_PREFIX')
+        self._pool = queue.LifoQueue()
+        self._apis = [self._create_api() for _ in range(pool_size)]
+        for api in self._apis:
+            self._pool.put(api)
+
+    def _create_api(self):
+        kwargs = {'lang': self.lang, 'psm': self.psm}
+        if self.tessdata_path:
+            kwargs['path'] = self.tessdata_path
+        return tesserocr.PyTessBaseAPI(**kwargs)
+
+    @staticmethod
+    def _to_pil(image):
+        if image.ndim == 2:
+            return Image.fromarray(image)
+        return Image.fromarray(cv2.cvtColor(image, cv2.COLOR_BGR2RGB))
+
+    def image_to_string(self, image):
+        """Recognize a single text line from a BGR or grayscale image."""
+        api = self._pool.get()
+        try:
+            api.SetImage(self._to_pil(image))
+            return api.GetUTF8Text()
+        finally:
+            api.Clear()
+            self._pool.put(api)
+
+    def image_to_words(self, image, psm=6):
+        """Recognize a multi-line image and return word-level boxes."""
+        api = self._pool.get()
+        try:
+            api.SetPageSegMode(psm)
+            api.SetImage(self._to_pil(image))
+            api.Recognize()
+            words = []
+            iterator = api.GetIterator()
+            if iterator is None:
+                return words
+            level = tesserocr.RIL.WORD
+            for result in tesserocr.iterate_level(iterator, level):
+                text = (result.GetUTF8Text(level) or '').strip()
+                box = result.BoundingBox(level)
+                if not text or box is None:
+                    continue
+                x1, y1, x2, y2 = box
+                words.append({
+                    'text': text,
+                    'left': x1,
+                    'top': y1,
+                    'width': x2 - x1,
+                    'height': y2 - y1,
+                    'conf': result.Confidence(level),
+                })
+            return words
+        finally:
+            api.SetPageSegMode(self.psm)
+            api.Clear()
+            self._pool.put(api)
+
+    def close(self):
+        for api in self._apis:
+            api.End()
+        self._apis = []
+
+
+OCR_BACKENDS = ('auto', 'tesserocr', 'pytesseract')
+
+_engines = {}
+_engines_lock = threading.Lock()
+
+
+def _create_engine(backend, lang, psm, pool_size):
+    if backend == 'pytesseract':
+        return PytesseractEngine(lang=lang, psm=psm)
+    if backend == 'tesserocr':
+        return TesserocrEngine(lang=lang, psm=psm, pool_size=pool_size)
+    if backend == 'auto':
+        if tesserocr is not None:
+            try:
+                return TesserocrEngine(lang=lang, psm=psm, pool_size=pool_size)
+            except RuntimeError as e:
+                logger.warning("⚠ tesserocr unavailable (%s), falling back to pytesseract", e)
+        return PytesseractEngine(lang=lang, psm=psm)
+    raise ValueError(f"Unknown OCR backend '{backend}', expected one of {OCR_BACKENDS}")
+
+
+def get_ocr_engine(backend='auto', lang='tur', psm=7, pool_size=1):
+    """Return a shared OCR engine for the given settings, creating it on first use.
+
+    Engines are cached per process and settings (pool size included), so
+    every ``TextExtractor`` in a process with the same settings reuses the
+    same warm recognizers. Forked workers build their own.
+    """
+    key = (os.getpid(), backend, lang, psm, pool_size)
+    with _engines_lock:
+        engine = _engines.get(key)
+        if engine is None:
+            engine = _create_engine(backend, lang, psm, pool_size)
+            _engines[key] = engine
+        return engine
@@ -0,0 +1,130 @@
+import time
+from collections import Counter, defaultdict
+from contextlib import contextmanager
+
+from pipeline_logging import get_logger
+
+logger = get_logger(__name__)
+
+
+class PipelineHooks:
+    """Receives timing events from ``IDCardProcessor``; override what you need.
+
+    Stages are ``detection``, ``field_extraction``, ``ocr`` (all fields of a
+    card) and ``ocr_call`` (one OCR engine call). ``info`` carries the stage's
+    details: image and card dimensions, field counts, crop sizes and so on.
+    ``stage_finished`` receives the stage's ``elapsed`` wall time in seconds,
+    and ``info['error']`` when the stage raised.
+    """
+
+    def stage_started(self, stage, info):
+        pass
+
+    def stage_finished(self, stage, elapsed, info):
+        pass
+
+
+class HookList(PipelineHooks):
+    """Forwards events to several hooks; a failing hook never breaks the pipeline.
+
+    ``counts`` tracks how often each stage finished through this list.
+    """
+
+    def __init__(self, hooks=()):
+        self.hooks = [hook for hook in hooks if hook is not None]
+        self.counts = Counter()
+
+    def _call(self, method, *args):
+        for hook in self.hooks:
+            try:
+                getattr(hook, method)(*args)
+            except Exception as e:
+                logger.warning("⚠ Pipeline hook %s failed: %s", type(hook).__name__, e)
+
+    def stage_started(self, stage, info):
+        self._call('stage_started', stage, info)
+
+    def stage_finished(self, stage, elapsed, info):
+        self._call('stage_finished', stage, elapsed, info)
+
+    @contextmanager
+    def stage(self, stage, **info):
+        """Time a block as ``stage``; the block may add details to the yielded ``info``."""
+        self.stage_started(stage, dict(info))
+        start = time.perf_counter()
+        try:
+            yield info
+        except Exception as e:
+            info['error'] = f"{type(e).__name__}: {e}"
+            raise
+        finally:
+            self.counts[stage] += 1
+            self.stage_finished(stage, time.perf_counter() - start, info)
+
+
+class ProgressHooks(PipelineHooks):
+    """Adapts timing events to a ``progress_callback(stage, percent)``."""
+
+    STAGE_PERCENT = {'detection': ('card_detection', 5),
+                     'field_extraction': ('field_extraction', 40),
+                     'ocr': ('ocr', 60)}
+
+    def __init__(self, progress_callback):
+        self.progress_callback = progress_callback
+
+    def stage_started(self, stage, info):
+        if stage in self.STAGE_PERCENT:
+            self.progress_callback(*self.STAGE_PERCENT[stage])
+
+    def stage_finished(self, stage, elapsed, info):
+        if stage == 'ocr_call' and 'error' not in info:
+            done, total = info['fields_done'], info['fields_total']
+            self.progress_callback(f'ocr_field_{done}_of_{total}', 60 + 35 * done // max(total, 1))
+
+
+class StageTimings(PipelineHooks):
+    """Collects elapsed seconds per stage, e.g. for latency histograms."""
+
+    def __init__(self):
+        self.timings = defaultdict(list)
+
+    def stage_finished(self, stage, elapsed, info):
+        self.timings[stage].append(elapsed)
+
+    def summary(self):
+        """Count, total and mean seconds of each stage."""
+        return {
+            stage: {'count': len(values), 'total': sum(values), 'mean': sum(values) / len(values)}
+            for stage, values in self.timings.items()
+        }
+
+
+class ImageSummary(PipelineHooks):
+    """Collects one image's stage timings and counts into a single record."""
+
+    def __init__(self, image_path):
+        self.record = {'image_path': image_path, 'success': False, 'timings': {}}
+        self._start = time.perf_counter()
+
+    def stage_finished(self, stage, elapsed, info):
+        record = self.record
+        record['timings'][stage] = record['timings'].get(stage, 0.0) + elapsed
+        if 'error' in info:
+            record['error'] = info['error']
+        if stage == 'detection':
+            for key in ('width', 'height', 'card_width', 'card_height', 'fallback'):
+                if key in info:
+                    record[key] = info[key]
+        elif stage == 'field_extraction':
+            record['fields'] = info.get('fields')
+        elif stage == 'ocr':
+            record['texts'] = info.get('texts')
+            record['ocr_calls'] = info.get('ocr_calls')
+
+    def finish(self, success, error=None):
+        """Complete the record with the outcome and total elapsed seconds."""
+        self.record['success'] = success
+        if error is not None:
+            self.record['error'] = error
+        self.record['elapsed'] = time.perf_counter() - self._start
+        return self.record
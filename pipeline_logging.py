@@ -0,0 +1,72 @@
+import json
+import logging
+import sys
+from datetime import datetime, timezone
+
+# Root of the pipeline's loggers; modules log to children such as "card_reader.main"
+LOGGER_NAME = 'card_reader'
+LOG_MODES = ('text', 'json', 'silent')
+
+# Set by setup_logging; None while the embedding application owns logging
+_settings = None
+
+
+def get_logger(module_name):
+    """Logger for a pipeline module, e.g. ``get_logger(__name__)``."""
+    return logging.getLogger(f'{LOGGER_NAME}.{module_name}')
+
+
+class JsonLinesFormatter(logging.Formatter):
+    """One JSON object per record; ``extra={'data': {...}}`` adds fields to it."""
+
+    def format(self, record):
+        entry = {
+            'time': datetime.fromtimestamp(record.created, timezone.utc).isoformat(),
+            'level': record.levelname.lower(),
+            'logger': record.name,
+            'message': record.getMessage(),
+        }
+        entry.update(getattr(record, 'data', None) or {})
+        if record.exc_info:
+            entry['exception'] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+def setup_logging(mode='text', level='INFO', stream=None):
+    """Configure the pipeline's log output.
+
+    Args:
+        mode: 'text' prints the messages as they are, 'json' writes JSON
+            lines with any structured ``data`` attached, 'silent' drops
+            everything so production runs pay only for a level check.
+        level: Minimum level, e.g. 'DEBUG' to include step separators.
+        stream: Output stream, stdout by default.
+    """
+    if mode not in LOG_MODES:
+        raise ValueError(f"Unknown log mode '{mode}', expected one of {LOG_MODES}")
+    global _settings
+    _settings = {'mode': mode, 'level': level}
+
+    logger = logging.getLogger(LOGGER_NAME)
+    for handler in list(logger.handlers):
+        logger.removeHandler(handler)
+    logger.propagate = False
+
+    if mode == 'silent':
+        logger.setLevel(logging.CRITICAL + 1)
+        logger.addHandler(logging.NullHandler())
+        return logger
+
+    handler = logging.StreamHandler(stream or sys.stdout)
+    if mode == 'json':
+        handler.setFormatter(JsonLinesFormatter())
+    else:
+        handler.setFormatter(logging.Formatter('%(message)s'))
+    logger.setLevel(level)
+    logger.addHandler(handler)
+    return logger
+
+
+def current_settings():
+    """Arguments of the last ``setup_logging`` call (or None), to repeat it in workers."""
+    return dict(_settings) if _settings else None
@@ -1,72 +1,187 @@
 import os
+import bisect
 import cv2
+import numpy as np
 import pytesseract
 
+from ocr_engines import get_ocr_engine
+from card_detection import WORKING_WIDTH
+from debug_sink import make_debug_sink
+from pipeline_hooks import HookList
+from pipeline_logging import get_logger
+
+logger = get_logger(__name__)
+
 
 class TextExtractor:
     """Extracts text from field images using OCR."""
     
-    def __init__(self, x_threshold=200, debug_mode=False):
+    def __init__(self, x_threshold=200, debug_mode=False, ocr_backend='auto',
+                 lang='tur', psm=7, ocr_pool_size=1, batch_ocr=False, batch_psm=6,
+                 batch_gap=20, debug_sink=None, save_results=True, reference_width=WORKING_WIDTH):
+        """
+        Args:
+            x_threshold: Fields starting left of this x are skipped; given for
+                a card ``reference_width`` wide and scaled to the actual card
+                (used as given when ``reference_width`` is None).
+            debug_sink: ``DebugSink`` receiving every field crop before OCR;
+                windows are shown in ``debug_mode``.
+            ocr_backend: 'tesserocr' keeps tesseract loaded between calls,
+                'pytesseract' spawns the CLI per field, 'auto' prefers the former.
+            ocr_pool_size: Number of warm recognizers for concurrent callers.
+            batch_ocr: Stitch all field crops of a card into one image and run
+                OCR once, instead of once per field.
+            batch_psm: Page segmentation mode used for the stitched image.
+            batch_gap: Blank pixels between stitched crops.
+            save_results: Write the texts to ``{base_name}_ocr_results.txt``.
+        """
         self.x_threshold = x_threshold
+        self.reference_width = reference_width
         self.debug_mode = debug_mode
+        self.debug = debug_sink or make_debug_sink(debug_mode)
+        self.ocr_backend = ocr_backend
+        self.lang = lang
+        self.psm = psm
+        self.ocr_pool_size = ocr_pool_size
+        self.batch_ocr = batch_ocr
+        self.batch_psm = batch_psm
+        self.batch_gap = batch_gap
+        self.save_results = save_results
+        # Why the last extract_text call failed (engine missing or raising), else None
+        self.last_error = None
+    
+    @property
+    def engine(self):
+        """Shared per-process OCR engine, so forked workers build their own."""
+        return get_ocr_engine(self.ocr_backend, self.lang, self.psm, self.ocr_pool_size)
+    
+    @staticmethod
+    def _field_label(field):
+        """Human-readable name of a field for log lines."""
+        if field.get('path'):
+            return os.path.basename(field['path'])
+        return f"{field['x']}_{field['y']}"
+    
+    def _build_montage(self, images):
+        """Stack field crops vertically on a white canvas.
+
+        Returns the montage and the (top, height) band each crop occupies.
+        """
+        gap = self.batch_gap
+        crops = [cv2.cvtColor(img, cv2.COLOR_GRAY2BGR) if img.ndim == 2 else img for img in images]
+        width = max(img.shape[1] for img in crops) + 2 * gap
+        height = sum(img.shape[0] for img in crops) + gap * (len(crops) + 1)
+        
+        montage = np.full((height, width, 3), 255, dtype=np.uint8)
+        bands = []
+        top = gap
+        for img in crops:
+            h, w = img.shape[:2]
+            montage[top:top + h, gap:gap + w] = img
+            bands.append((top, h))
+            top += h + gap
+        return montage, bands
     
-    def _show_debug_image(self, window_name, image):
-        """Show debug image if debug mode is enabled."""
-        if not self.debug_mode:
-            return
+    def _ocr_batch(self, images):
+        """OCR all crops with a single engine call and split the words back per crop."""
+        if not images:
+            return []
+        
+        montage, bands = self._build_montage(images)
+        words = self.engine.image_to_words(montage, psm=self.batch_psm)
+        
+        # Each crop owns its band plus half of the gap on either side
+        band_starts = [top - self.batch_gap / 2 for top, _ in bands]
+        field_words = [[] for _ in images]
+        for word in words:
+            center_y = word['top'] + word['height'] / 2
+            index = max(bisect.bisect_right(band_starts, center_y) - 1, 0)
+            field_words[index].append(word)
         
-        print(f"  [DEBUG] Showing '{window_name}' - Press any key to continue...")
-        cv2.imshow(window_name, image)
-        cv2.waitKey(0)
+        return [
+            ' '.join(w['text'] for w in sorted(found, key=lambda w: w['left']))
+            for found in field_words
+        ]
     
-    def extract_text(self, field_info, base_name, output_dir='output'):
-        """Run OCR on field images and extract text."""
+    def extract_text(self, field_info, base_name, output_dir='output', hooks=None, card_width=None):
+        """Run OCR on field images and extract text.
+
+        Fields are read from their in-memory ``image`` crop when present and
+        from ``path`` on disk otherwise. With ``batch_ocr`` all crops of the
+        card are recognized in one engine call. Each engine call is reported
+        to ``hooks`` (a ``HookList``) as an ``ocr_call`` stage. ``card_width``
+        scales ``x_threshold`` from the reference width to this card.
+        Recognized text is also stored on its field dict under ``text``.
+        OCR failures are logged and return an empty list, with the reason
+        kept in ``last_error``.
+        """
+        self.last_error = None
+        hooks = hooks or HookList()
+        x_threshold = self.x_threshold
+        if card_width and self.reference_width:
+            x_threshold = x_threshold * card_width / self.reference_width
+        
         # Filter fields by x coordinate
-        filtered_fields = [f for f in field_info if f['x'] > self.x_threshold]
-        print(f"✓ Processing {len(filtered_fields)} fields (x > {self.x_threshold})")
+        filtered_fields = [f for f in field_info if f['x'] > x_threshold]
+        logger.info("✓ Processing %d fields (x > %d)", len(filtered_fields), x_threshold)
         
         # Sort by y coordinate (top to bottom)
         filtered_fields.sort(key=lambda f: f['y'])
         
         extracted_texts = []
         try:
+            loaded = []
             for i, field in enumerate(filtered_fields, 1):
-                image = cv2.imread(field['path'])
+                image = field.get('image')
+                if image is None:
+                    image = cv2.imread(field['path'])
                 if image is None:
-                    print(f"⚠ Warning: Could not read {field['path']}")
+                    logger.warning("⚠ Warning: Could not read %s", field['path'])
                     continue
                 
-                # Show field being processed in debug mode
-                if self.debug_mode:
-                    self._show_debug_image(f'OCR - Field {i}/{len(filtered_fields)}', image)
-                
-                config = '--psm 7'
-                text = pytesseract.image_to_string(image, lang='tur', config=config)
+                self.debug.emit(f'OCR - Field {i}/{len(filtered_fields)}', image)
+                loaded.append((field, image))
+            
+            images = [image for _, image in loaded]
+            total = len(images)
+            if self.batch_ocr:
+                with hooks.stage('ocr_call', fields_done=total, fields_total=total, batch=True,
+                                 crops=total) as info:
+                    texts = self._ocr_batch(images)
+                    info['chars'] = sum(len(text.strip()) for text in texts)
+            else:
+                texts = []
+                for done, image in enumerate(images, 1):
+                    with hooks.stage('ocr_call', fields_done=done, fields_total=total, batch=False,
+                                     width=image.shape[1], height=image.shape[0]) as info:
+                        texts.append(self.engine.image_to_string(image))
+                        info['chars'] = len(texts[-1].strip())
+            
+            for (field, _), text in zip(loaded, texts):
                 text = text.strip()
-                
+                label = self._field_label(field)
                 if text:
-                    print(f"  ✓ {os.path.basename(field['path'])} (y={field['y']}) -> {text}")
+                    logger.info("  ✓ %s (y=%d) -> %s", label, field['y'], text)
                     extracted_texts.append(text)
+                    field['text'] = text
                 else:
-                    print(f"  ⚠ {os.path.basename(field['path'])} (y={field['y']}) -> No text")
-            
-            # Close all debug windows after OCR
-            if self.debug_mode:
-                cv2.destroyAllWindows()
+                    logger.info("  ⚠ %s (y=%d) -> No text", label, field['y'])
         
         except pytesseract.TesseractNotFoundError:
-            print("\n❌ TESSERACT NOT FOUND ERROR")
-            print("Please install Tesseract-OCR and Turkish language pack")
+            logger.error("❌ TESSERACT NOT FOUND ERROR - "
+                         "Please install Tesseract-OCR and Turkish language pack")
+            self.last_error = "Tesseract is not installed"
             return []
         except Exception as e:
-            print(f"❌ OCR error: {e}")
+            logger.error("❌ OCR error: %s", e)
+            self.last_error = str(e)
             return []
         
         # Save results
-        output_file = os.path.join(output_dir, f'{base_name}_ocr_results.txt')
-        with open(output_file, 'w', encoding='utf-8') as f:
-            for text in extracted_texts:
-                f.write(text + '\n')
-        
-        print(f"✓ Saved OCR results to '{output_file}'")
+        if self.save_results:
+            output_file = os.path.join(output_dir, f'{base_name}_ocr_results.txt')
+            with open(output_file, 'w', encoding='utf-8') as f:
+                for text in extracted_texts:
+                    f.write(text + '\n')
+            logger.info("✓ Saved OCR results to '%s'", output_file)
         return extracted_texts
\ No newline at end of file